@@ -0,0 +1,185 @@
+"""
+経路探索とダンジョン生成のベンチマーク。
+
+シード固定で複数サイズのマップを生成し、以下を計測して JSON のレポートを出力する。
+    - DungeonGenerator.generate_map の生成時間とピークメモリ
+    - find_path のレイテンシ・展開ノード数・ピークメモリ
+    - get_next_step / compute_distance_map のレイテンシ
+
+使い方（リポジトリのルートで実行）:
+    python -m benchmarks.bench_pathfinding --output bench.json
+    python -m benchmarks.bench_pathfinding --baseline bench.json --tolerance 0.2
+
+--baseline を指定すると、各サイズの *_ms の中央値がベースラインより
+tolerance の割合を超えて遅くなった場合に一覧を表示して終了コード 1 で終わる。
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from src.settings import TILE_FLOOR
+from src.dungeon import DungeonGenerator
+from src.grid import tile_positions
+from src.pathfinding import find_path, get_next_step, compute_distance_map
+
+REPORT_VERSION = 1
+DEFAULT_SIZES = ["30x20", "100x100", "300x300", "1000x1000"]
+
+
+def parse_size(text):
+    """"30x20" 形式の文字列を (width, height) に変換する"""
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def summarize(samples):
+    """計測値のリストを要約する"""
+    return {
+        "mean": statistics.fmean(samples),
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+def measure_peak_kib(func):
+    """func を1回実行し、(戻り値, ピークメモリ KiB) を返す"""
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / 1024
+
+
+def bench_size(width, height, seed, maps, pairs, algorithm):
+    """1つのマップサイズについて計測する"""
+    generate_ms = []
+    generate_peak_kib = []
+    find_path_ms = []
+    find_path_nodes = []
+    find_path_peak_kib = []
+    next_step_ms = []
+    distance_map_ms = []
+
+    for map_index in range(maps):
+        map_seed = seed + map_index
+        generator = DungeonGenerator(backend="list", seed=map_seed)
+
+        start_time = time.perf_counter()
+        map_data = generator.generate_map(width, height)
+        generate_ms.append((time.perf_counter() - start_time) * 1000)
+
+        _, peak = measure_peak_kib(lambda: DungeonGenerator(backend="list", seed=map_seed).generate_map(width, height))
+        generate_peak_kib.append(peak)
+
+        floors = tile_positions(map_data, TILE_FLOOR)
+        if len(floors) < 2:
+            continue
+        rng = random.Random(map_seed)
+        queries = [(rng.choice(floors), rng.choice(floors)) for _ in range(pairs)]
+
+        for start, goal in queries:
+            stats = {}
+            start_time = time.perf_counter()
+            find_path(start, goal, map_data, stats, algorithm=algorithm)
+            find_path_ms.append((time.perf_counter() - start_time) * 1000)
+            find_path_nodes.append(stats.get("nodes_expanded", 0))
+
+            start_time = time.perf_counter()
+            get_next_step(start, goal, map_data, algorithm=algorithm)
+            next_step_ms.append((time.perf_counter() - start_time) * 1000)
+
+            start_time = time.perf_counter()
+            compute_distance_map(goal, map_data)
+            distance_map_ms.append((time.perf_counter() - start_time) * 1000)
+
+        # メモリ計測は計測オーバーヘッドが大きいので1マップにつき1回だけ
+        start, goal = queries[0]
+        _, peak = measure_peak_kib(lambda: find_path(start, goal, map_data, algorithm=algorithm))
+        find_path_peak_kib.append(peak)
+
+    result = {
+        "generate_ms": summarize(generate_ms),
+        "generate_peak_kib": summarize(generate_peak_kib),
+    }
+    if find_path_ms:
+        result.update({
+            "find_path_ms": summarize(find_path_ms),
+            "find_path_nodes": summarize(find_path_nodes),
+            "find_path_peak_kib": summarize(find_path_peak_kib),
+            "get_next_step_ms": summarize(next_step_ms),
+            "distance_map_ms": summarize(distance_map_ms),
+        })
+    return result
+
+
+def find_regressions(report, baseline, tolerance):
+    """ベースラインより遅くなった項目を (サイズ, 項目, 基準値, 今回値) のリストで返す"""
+    regressions = []
+    for size, metrics in report["results"].items():
+        base_metrics = baseline.get("results", {}).get(size)
+        if base_metrics is None:
+            continue
+        for name, summary in metrics.items():
+            if not name.endswith("_ms") or name not in base_metrics:
+                continue
+            base = base_metrics[name]["median"]
+            current = summary["median"]
+            if base > 0 and current > base * (1 + tolerance):
+                regressions.append((size, name, base, current))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="経路探索とダンジョン生成のベンチマーク")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="マップサイズ (例: 30x20 100x100)")
+    parser.add_argument("--seed", type=int, default=0, help="マップ生成と探索地点選択のシード")
+    parser.add_argument("--maps", type=int, default=3, help="サイズごとに生成するマップ数")
+    parser.add_argument("--pairs", type=int, default=20, help="マップごとの探索 (スタート, ゴール) の組数")
+    parser.add_argument("--algorithm", choices=["astar", "jps"], default="astar", help="find_path の探索エンジン")
+    parser.add_argument("--output", help="JSON レポートの出力先（省略時は標準出力）")
+    parser.add_argument("--baseline", help="比較するベースラインの JSON レポート")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="許容する遅延の割合 (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "version": REPORT_VERSION,
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "maps": args.maps,
+        "pairs": args.pairs,
+        "algorithm": args.algorithm,
+        "results": {},
+    }
+    for size in args.sizes:
+        width, height = parse_size(size)
+        print(f"benchmarking {width}x{height} ...", file=sys.stderr)
+        report["results"][f"{width}x{height}"] = bench_size(width, height, args.seed, args.maps, args.pairs, args.algorithm)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for size, name, base, current in regressions:
+            print(f"REGRESSION {size} {name}: {base:.3f} ms -> {current:.3f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
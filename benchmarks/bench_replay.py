@@ -0,0 +1,131 @@
+"""
+記録したプレイ（src/replay.py の TurnRecorder で書き出したもの）を最大速度で再生し、ターンごとの処理時間を計測する。
+敵のAIや階層の切り替えを、実際のプレイに近い負荷で繰り返しプロファイルするためのもの。
+
+記録の作り方: settings.py の REPLAY_RECORD_DIR にディレクトリを指定してゲームを遊ぶと、
+1ゲームごとに replay_<seed>.json が書き出される。
+
+使い方（リポジトリのルートで実行）:
+    python -m benchmarks.bench_replay replays/replay_123.json --output replay_bench.json
+    python -m benchmarks.bench_replay replays/replay_123.json --render  # 描画込みで計測
+    python -m benchmarks.bench_replay replays/replay_123.json --baseline replay_bench.json --tolerance 0.2
+"""
+import argparse
+import json
+import platform
+import sys
+
+from src.engine import GameEngine
+from src.replay import load_replay, replay, settings_diff, state_digest
+from benchmarks.bench_pathfinding import summarize, find_regressions
+
+REPORT_VERSION = 1
+SLOWEST_TURNS = 10
+
+
+def run_replay(data, render=False, prefetch=True):
+    """
+    記録を1回再生する。
+
+    Returns:
+        tuple: (ターンごとの処理時間のリスト, 行動後の階層のリスト, 最終状態のハッシュ)
+    """
+    engine = GameEngine(width=data["width"], height=data["height"], prefetch=prefetch)
+    floors = []
+    on_turn = None
+    if render:
+        # 描画する場合だけ pygame を読み込む（画面なしの計測は pygame なしでも動く）
+        import pygame
+        from src.game import Game
+        game = Game(engine)
+        game.state = "playing"
+        def on_turn(turn, action):
+            game.update()
+            game.draw()
+            pygame.event.pump()
+
+    def record_floor(turn, action):
+        if turn >= 0:
+            floors.append(engine.floor)
+        if on_turn is not None:
+            on_turn(turn, action)
+
+    turn_ms = replay(data, engine, record_floor)
+    return turn_ms, floors, state_digest(engine)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="記録したプレイを再生してターンごとの処理時間を計測する")
+    parser.add_argument("replay", help="TurnRecorder で書き出した記録 (JSON)")
+    parser.add_argument("--repeat", type=int, default=1, help="再生する回数（処理時間は全回分をまとめて集計する）")
+    parser.add_argument("--render", action="store_true", help="ターンごとに描画する（FPSの待ちは入れない）")
+    parser.add_argument("--no-prefetch", action="store_true", help="次の階層の先読みを無効にする")
+    parser.add_argument("--output", help="JSON レポートの出力先（省略時は標準出力）")
+    parser.add_argument("--baseline", help="比較するベースラインの JSON レポート")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="許容する遅延の割合 (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    data = load_replay(args.replay)
+    changed_settings = settings_diff(data)
+    for name, recorded, current in changed_settings:
+        print(f"SETTING {name}: recorded {recorded!r}, current {current!r}", file=sys.stderr)
+    turn_ms = []
+    total_ms = []
+    level_ms = []
+    slowest = []
+    desync = False
+    for _ in range(args.repeat):
+        times, floors, digest = run_replay(data, args.render, not args.no_prefetch)
+        desync = desync or digest != data["final_state"]
+        turn_ms.extend(times)
+        total_ms.append(sum(times))
+        # 階層が変わったターン（階段を降りたターン）は別に集計する
+        level_ms.extend(ms for i, ms in enumerate(times) if floors[i] != (floors[i - 1] if i > 0 else 1))
+        slowest.extend({"turn": i, "floor": floors[i], "ms": ms} for i, ms in enumerate(times))
+    if desync:
+        if changed_settings:
+            names = ", ".join(name for name, _, _ in changed_settings)
+            print(f"WARNING: final state differs from the recording (settings changed: {names})", file=sys.stderr)
+        else:
+            print("WARNING: final state differs from the recording (code changed?)", file=sys.stderr)
+
+    results = {}
+    if turn_ms:
+        results["turn_ms"] = summarize(turn_ms)
+        results["total_ms"] = summarize(total_ms)
+    if level_ms:
+        results["level_ms"] = summarize(level_ms)
+    report = {
+        "version": REPORT_VERSION,
+        "python": platform.python_version(),
+        "replay": args.replay,
+        "seed": data["seed"],
+        "turns": len(data["actions"]),
+        "repeat": args.repeat,
+        "render": args.render,
+        "desync": desync,
+        "settings_diff": {name: {"recorded": recorded, "current": current} for name, recorded, current in changed_settings},
+        "results": {"replay": results},
+        "slowest_turns": sorted(slowest, key=lambda turn: turn["ms"], reverse=True)[:SLOWEST_TURNS],
+    }
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for name, metric, base, current in regressions:
+            print(f"REGRESSION {name} {metric}: {base:.3f} ms -> {current:.3f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import json
+import os
+import pygame
+from src.settings import TILE_SIZE, ASSET_CACHE_DIR
+
+# 画像の名前とファイル名（assets/ 以下）
+ASSET_FILES = {
+    "floor": "floor.png",
+    "wall": "wall.png",
+    "downstairs": "downstairs.png",
+    "player": "player.png",
+    "enemy": "enemy.png",
+}
+
+# ディスクキャッシュの形式が変わったら上げる
+CACHE_VERSION = 1
+
+
+class AssetManager:
+    """
+    タイル・スプライト画像を読み込み、TILE_SIZE に拡大縮小して1枚のアトラス（横一列に並べた Surface）にまとめる。
+    アトラスは convert_alpha() で画面のピクセル形式に1回だけ変換しておくので、描画のたびに形式の変換が起きない。
+    各画像はアトラスの subsurface として返す（ピクセルはアトラスと共有する）。
+    cache_dir を指定すると、拡大縮小済みのアトラスをディスクに保存し、次回の起動では元画像が
+    変わっていない限りそれを1回読み込むだけで済ませる。
+    """
+    def __init__(self, asset_dir, tile_size=TILE_SIZE, cache_dir=ASSET_CACHE_DIR, files=ASSET_FILES, messages=None):
+        self.asset_dir = asset_dir
+        self.tile_size = tile_size
+        self.cache_dir = cache_dir # None ならディスクキャッシュを使わない
+        self.files = files
+        self.messages = messages # ディスクキャッシュに書き込めなかったことを知らせるメッセージログ（None なら知らせない）
+        self.atlas = None
+        self.rects = {} # 名前 -> アトラス上の矩形 (x, y, w, h)
+        self.images = {} # 名前 -> アトラスの subsurface
+        self._scaled = {} # (名前, サイズ) -> 拡大縮小した Surface
+
+    def load(self):
+        """
+        アトラスを用意して、名前 -> Surface の辞書を返す。
+        画面のピクセル形式に変換するので、pygame.display.set_mode() の後に呼ぶ。
+        """
+        sources = self._source_stamps()
+        atlas = self._load_cache(sources)
+        if atlas is None:
+            atlas = self._build_atlas()
+            self._save_cache(atlas, sources)
+
+        self.atlas = atlas.convert_alpha()
+        self.images = {name: self.atlas.subsurface(rect) for name, rect in self.rects.items()}
+        self._scaled = {}
+        return self.images
+
+    def get(self, name, size=None):
+        """
+        画像を返す。size (幅, 高さ) を指定した場合は拡大縮小したものを返す（サイズごとに1回だけ作る）。
+        """
+        if size is None or size == (self.tile_size, self.tile_size):
+            return self.images[name]
+        key = (name, size)
+        image = self._scaled.get(key)
+        if image is None:
+            image = pygame.transform.scale(self.images[name], size).convert_alpha()
+            self._scaled[key] = image
+        return image
+
+    def _build_atlas(self):
+        """元画像を読み込んで拡大縮小し、横一列に並べたアトラスを作る"""
+        size = self.tile_size
+        atlas = pygame.Surface((size * len(self.files), size), pygame.SRCALPHA)
+        self.rects = {}
+        for i, (name, filename) in enumerate(self.files.items()):
+            image = pygame.image.load(os.path.join(self.asset_dir, filename))
+            atlas.blit(pygame.transform.scale(image, (size, size)), (i * size, 0))
+            self.rects[name] = (i * size, 0, size, size)
+        return atlas
+
+    def _source_stamps(self):
+        """元画像ごとの (更新時刻, サイズ)。ディスクキャッシュが古くなっていないかの判定に使う"""
+        stamps = {}
+        for name, filename in self.files.items():
+            stat = os.stat(os.path.join(self.asset_dir, filename))
+            stamps[name] = [filename, stat.st_mtime_ns, stat.st_size]
+        return stamps
+
+    def _cache_paths(self):
+        """ディスクキャッシュの (画像, 索引) のパス"""
+        base = os.path.join(self.cache_dir, f"atlas_{self.tile_size}")
+        return base + ".png", base + ".json"
+
+    def _load_cache(self, sources):
+        """ディスクキャッシュが使えればアトラスを読み込んで返す（使えなければ None）"""
+        if self.cache_dir is None:
+            return None
+        image_path, index_path = self._cache_paths()
+        try:
+            with open(index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            if (index.get("version") != CACHE_VERSION or index.get("tile_size") != self.tile_size
+                    or index.get("sources") != sources):
+                return None
+            atlas = pygame.image.load(image_path)
+        except (OSError, ValueError, pygame.error):
+            return None # キャッシュが壊れている・ない場合は作り直す
+        self.rects = {name: tuple(rect) for name, rect in index["rects"].items()}
+        return atlas
+
+    def _save_cache(self, atlas, sources):
+        """アトラスをディスクキャッシュに保存する（保存できなくてもゲームは続ける）"""
+        if self.cache_dir is None:
+            return
+        image_path, index_path = self._cache_paths()
+        index = {
+            "version": CACHE_VERSION,
+            "tile_size": self.tile_size,
+            "sources": sources,
+            "rects": self.rects,
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            pygame.image.save(atlas, image_path)
+            with open(index_path, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+        except (OSError, pygame.error) as e:
+            if self.messages is not None:
+                self.messages.warning(f"Failed to write asset cache: {e}")
@@ -0,0 +1,95 @@
+"""
+NumPy を使って敵の行動フェーズをまとめて計算する (ENEMY_PHASE = "batched")。
+行動確率の判定・プレイヤーとの距離・索敵判定・ランダム移動の行き先を全ての敵について配列で一度に求め、
+Python で1体ずつ処理するのは実際に動く敵の位置の書き込みと、経路探索が必要な追跡だけにする。
+"""
+from src.settings import TILE_WALL
+
+try:
+    import numpy as np
+except ImportError:  # NumPy はオプション
+    np = None
+
+# ランダム移動の方向（Enemy.wander と同じ4方向）
+DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("ENEMY_PHASE = \"batched\" を使うには NumPy が必要です")
+
+
+def create_rng(seed=None):
+    """敵の行動フェーズ用の乱数生成器を作る"""
+    _require_numpy()
+    return np.random.default_rng(seed)
+
+
+def walkable_array(map_data):
+    """壁でないタイルを True とする bool 配列 (height, width) を作る（1階層につき1回作って使い回す）"""
+    _require_numpy()
+    return np.asarray(map_data) != TILE_WALL
+
+
+def update_enemies(enemies, walkable, player_x, player_y, rng, fov=None):
+    """
+    全ての敵の行動をまとめて判定し、索敵範囲外の敵をランダムに1歩動かす。
+    
+    Args:
+        enemies (list[Enemy]): 敵のリスト
+        walkable (numpy.ndarray): walkable_array の結果
+        player_x (int): プレイヤーのタイル座標
+        player_y (int): プレイヤーのタイル座標
+        rng (numpy.random.Generator): create_rng の結果
+        fov (FieldOfView): プレイヤーの視界。渡された場合、視界の外にいる敵は追跡しない
+        
+    Returns:
+        list[Enemy]: 行動する敵のうち、索敵範囲内でプレイヤーを追跡する敵（経路探索は呼び出し側で1体ずつ行う）
+    """
+    count = len(enemies)
+    if count == 0:
+        return []
+    
+    xs = np.fromiter((enemy.x for enemy in enemies), dtype=np.int64, count=count)
+    ys = np.fromiter((enemy.y for enemy in enemies), dtype=np.int64, count=count)
+    act_chance = np.fromiter((enemy.act_chance for enemy in enemies), dtype=np.float64, count=count)
+    sight_range = np.fromiter((enemy.sight_range for enemy in enemies), dtype=np.int64, count=count)
+    
+    # 行動確率チェックと索敵判定（マンハッタン距離）
+    acting = rng.random(count) <= act_chance
+    distance = np.abs(xs - player_x) + np.abs(ys - player_y)
+    chasing = acting & (distance <= sight_range)
+    if fov is not None:
+        visible = np.frombuffer(fov.visible, dtype=np.uint8)
+        chasing &= visible[ys * fov.width + xs] != 0
+    wandering = np.flatnonzero(acting & ~chasing)
+    
+    if len(wandering) > 0:
+        height, width = walkable.shape
+        
+        # 敵ごとに4方向をランダムな順に並べ、最初に進める方向を選ぶ
+        order = np.argsort(rng.random((len(wandering), 4)), axis=1)
+        directions = np.array(DIRECTIONS)[order]
+        candidate_x = xs[wandering, None] + directions[..., 0]
+        candidate_y = ys[wandering, None] + directions[..., 1]
+        inside = (candidate_x >= 0) & (candidate_x < width) & (candidate_y >= 0) & (candidate_y < height)
+        
+        # 動く前の時点で壁でも、プレイヤーや他の敵のいるタイルでもない方向だけ進める
+        occupied = np.zeros_like(walkable)
+        occupied[ys, xs] = True
+        occupied[player_y, player_x] = True
+        can_move = np.zeros_like(inside)
+        cx, cy = candidate_x[inside], candidate_y[inside]
+        can_move[inside] = walkable[cy, cx] & ~occupied[cy, cx]
+        
+        movers = np.flatnonzero(can_move.any(axis=1))
+        first = can_move.argmax(axis=1)[movers]
+        target_x = candidate_x[movers, first].tolist()
+        target_y = candidate_y[movers, first].tolist()
+        for index, x, y in zip(wandering[movers].tolist(), target_x, target_y):
+            enemy = enemies[index]
+            # 同じターンに先に動いた敵と行き先が重なった場合はその場にとどまる
+            if not enemy.is_blocked(x, y):
+                enemy.move_to(x, y)
+    
+    return [enemies[index] for index in np.flatnonzero(chasing).tolist()]
@@ -1,4 +1,7 @@
+import bisect
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 from src.settings import (
     TILE_FLOOR,
     TILE_WALL,
@@ -7,7 +10,12 @@ from src.settings import (
     BSP_MIN_LEAF_SIZE,
     BSP_MIN_ROOM_SIZE,
     BSP_ROOM_MARGIN,
+    MAP_BACKEND,
 )
+from src.grid import create_map, create_labels, fill_labels, fill_rect, pack_map
+
+# 連結成分を求めるときに矩形を振り分ける格子の1マスの大きさ（タイル数）
+LABEL_CELL_SIZE = 16
 
 class Node:
     """BSP木のノード。ダンジョンの区画を表す。"""
@@ -31,9 +39,22 @@ class DungeonGenerator:
     """
     BSP（二分空間分割）法を使用してダンジョンを生成するクラス。
     """
-    def __init__(self):
+    def __init__(self, backend=MAP_BACKEND, seed=None):
+        self.backend = backend  # マップデータの形式 ("list" / "numpy")
+        # 生成器ごとの乱数。同じ seed なら同じマップ列が生成される (None なら毎回異なる)
+        self.seed = seed
+        self.rng = random.Random(seed)
         self.map_data = []
         self.rooms = [] # 生成された部屋のリスト (x, y, w, h)
+        self.corridors = [] # 通路の直線部分のリスト (x, y, w, h)（マップ内に切り詰めたもの）
+        self.width = 0 # マップの幅（ラベルのインデックス y * width + x に使う）
+        self.height = 0
+        # タイルごとの連結成分の番号（壁は -1）。番号が違えば互いに到達できない
+        # ラベルはマップの形式に合わせた1次元配列（grid.create_labels、インデックスは y * width + x）
+        self.region_map = None
+        self.room_map = None # タイルごとの部屋番号（self.rooms のインデックス。部屋の外は -1）
+        self.room_regions = [] # 部屋ごとの連結成分の番号
+        self.floor_index = {} # 床の索引 {連結成分の番号 (None なら全体): (矩形のリスト, 面積の累積和)}
         self.max_depth = BSP_MAX_DEPTH
         self.min_size = BSP_MIN_LEAF_SIZE  # 区画の最小サイズ
         self.min_room_size = BSP_MIN_ROOM_SIZE # 部屋の最小サイズ
@@ -49,12 +70,13 @@ class DungeonGenerator:
             height (int): マップの高さ（タイル数）
             
         Returns:
-            list[list[int]]: タイル情報の2次元配列 (0: 床, 1: 壁)
+            list[list[int]] or numpy.ndarray: タイル情報の2次元配列 (0: 床, 1: 壁)。
+                backend が "numpy" の場合は shape (height, width) の uint8 配列
         """
         # すべてのタイルを壁に設定
-        # width 個の TILE_WALL を要素に持つ配列を height 個作成
-        self.map_data = [[TILE_WALL for _ in range(width)] for _ in range(height)]
+        self.map_data = create_map(width, height, TILE_WALL, self.backend)
         self.rooms = [] # 部屋リストを初期化
+        self.corridors = []
         
         root = Node(0, 0, width, height)
         
@@ -64,15 +86,35 @@ class DungeonGenerator:
         # 部屋と通路の生成
         self._create_rooms_and_corridors(root)
         
+        # 連結成分と部屋番号
+        self._label_regions(width, height)
+        
         return self.map_data
 
+    def restore(self, map_data, rooms, corridors):
+        """
+        保存しておいたマップと部屋・通路から状態を復元する（生成し直さない）。
+        連結成分・部屋番号・床の索引は部屋と通路の矩形から作り直す。
+        
+        Args:
+            map_data (list[list[int]] or numpy.ndarray): マップデータ
+            rooms (list[tuple]): 部屋のリスト (x, y, w, h)
+            corridors (list[tuple]): 通路の直線部分のリスト (x, y, w, h)
+        """
+        self.map_data = map_data
+        self.rooms = list(rooms)
+        self.corridors = list(corridors)
+        height = len(map_data)
+        width = len(map_data[0]) if height > 0 else 0
+        self._label_regions(width, height)
+
     def _split_node(self, node, depth):
         """ノードを再帰的に分割する"""
         if depth <= 0:
             return
 
         # 分割方向を決定 (縦長なら水平分割、横長なら垂直分割しやすくする)
-        split_vertically = random.choice([True, False])
+        split_vertically = self.rng.choice([True, False])
         if node.width > node.height * self.aspect_ratio_threshold:
             split_vertically = True
         elif node.height > node.width * self.aspect_ratio_threshold:
@@ -84,7 +126,7 @@ class DungeonGenerator:
                 return # 幅が最小値x2 未満であれば分割不可
             
             # 分割幅は最小値を考慮しつつランダムに決定
-            split_x = random.randint(self.min_size, node.width - self.min_size)
+            split_x = self.rng.randint(self.min_size, node.width - self.min_size)
             # 分割後の子ノードを作成
             node.left = Node(node.x, node.y, split_x, node.height)
             node.right = Node(node.x + split_x, node.y, node.width - split_x, node.height)
@@ -93,7 +135,7 @@ class DungeonGenerator:
             if node.height < self.min_size * 2:
                 return # 高さが最小値x2 未満であれば分割不可
             
-            split_y = random.randint(self.min_size, node.height - self.min_size)
+            split_y = self.rng.randint(self.min_size, node.height - self.min_size)
             node.left = Node(node.x, node.y, node.width, split_y)
             node.right = Node(node.x, node.y + split_y, node.width, node.height - split_y)
 
@@ -122,8 +164,8 @@ class DungeonGenerator:
         max_room_w = max(self.min_room_size, node.width - margin * 2)
         max_room_h = max(self.min_room_size, node.height - margin * 2)
 
-        w = random.randint(self.min_room_size, max_room_w)
-        h = random.randint(self.min_room_size, max_room_h)
+        w = self.rng.randint(self.min_room_size, max_room_w)
+        h = self.rng.randint(self.min_room_size, max_room_h)
 
         # 部屋の左上が区画からはみ出さないように範囲を計算
         x_min = node.x + margin
@@ -131,17 +173,14 @@ class DungeonGenerator:
         x_max = node.x + node.width - w - margin
         y_max = node.y + node.height - h - margin
 
-        x = random.randint(x_min, x_max) if x_min <= x_max else x_min
-        y = random.randint(y_min, y_max) if y_min <= y_max else y_min
+        x = self.rng.randint(x_min, x_max) if x_min <= x_max else x_min
+        y = self.rng.randint(y_min, y_max) if y_min <= y_max else y_min
         
         node.room = (x, y, w, h)
         self.rooms.append(node.room) # 部屋リストに追加
         
         # マップデータに書き込み
-        for i in range(y, y + h):
-            for j in range(x, x + w):
-                if 0 <= i < len(self.map_data) and 0 <= j < len(self.map_data[0]):
-                    self.map_data[i][j] = TILE_FLOOR
+        fill_rect(self.map_data, x, y, w, h, TILE_FLOOR)
 
     def _create_corridor(self, node1, node2):
         """2つのノード（の中心）を繋ぐ通路を作成"""
@@ -150,7 +189,7 @@ class DungeonGenerator:
         
         # L字型の通路を作成
         # 水平移動 -> 垂直移動
-        if random.choice([True, False]):
+        if self.rng.choice([True, False]):
             self._h_corridor(x1, x2, y1)
             self._v_corridor(y1, y2, x2)
         else:
@@ -159,12 +198,177 @@ class DungeonGenerator:
 
     def _h_corridor(self, x1, x2, y):
         """水平方向の通路"""
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            if 0 <= y < len(self.map_data) and 0 <= x < len(self.map_data[0]):
-                self.map_data[y][x] = TILE_FLOOR
+        self._carve_corridor(min(x1, x2), y, abs(x1 - x2) + 1, 1)
 
     def _v_corridor(self, y1, y2, x):
         """垂直方向の通路"""
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            if 0 <= y < len(self.map_data) and 0 <= x < len(self.map_data[0]):
-                self.map_data[y][x] = TILE_FLOOR
+        self._carve_corridor(x, min(y1, y2), 1, abs(y1 - y2) + 1)
+
+    def _carve_corridor(self, x, y, w, h):
+        """通路を掘り、マップ内に切り詰めた矩形を self.corridors に記録する"""
+        rect = _clip_rect((x, y, w, h), len(self.map_data[0]), len(self.map_data))
+        if rect is not None:
+            fill_rect(self.map_data, *rect, TILE_FLOOR)
+            self.corridors.append(rect)
+
+    def _label_regions(self, width, height):
+        """
+        床タイルの連結成分・部屋番号と床の索引を求める。
+        床はすべて部屋と通路の矩形を掘ってできているので、タイルを1枚ずつ調べる代わりに
+        矩形同士の重なり・接触だけを調べる（つながりの判定は矩形の数だけで決まり、
+        ラベルの書き込みも矩形ごとの行のスライス代入で済む）。
+        """
+        self.width = width
+        self.height = height
+        room_rects = [_clip_rect(room, width, height) for room in self.rooms]
+        rects = room_rects + self.corridors
+        
+        # 接している矩形同士を Union-Find でまとめる
+        parent = list(range(len(rects)))
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        # 全ての組を比べると矩形の数の2乗に比例するので、矩形を粗い格子のマスに振り分け、
+        # 同じマスに入った（近くにある）矩形同士だけを比べる。辺で接している矩形も同じマスに入るように、
+        # 1タイル広げた範囲が重なるマスに登録する
+        cells = {}
+        for i, rect in enumerate(rects):
+            if rect is None:
+                continue
+            x, y, w, h = rect
+            for cell_y in range((y - 1) // LABEL_CELL_SIZE, (y + h) // LABEL_CELL_SIZE + 1):
+                for cell_x in range((x - 1) // LABEL_CELL_SIZE, (x + w) // LABEL_CELL_SIZE + 1):
+                    cells.setdefault((cell_x, cell_y), []).append(i)
+        for members in cells.values():
+            for k, i in enumerate(members):
+                for j in members[k + 1:]:
+                    root_i, root_j = find(i), find(j)
+                    if root_i != root_j and _rects_touch(rects[i], rects[j]):
+                        parent[root_i] = root_j
+        
+        # 連結成分ごとに番号を振り、タイルに書き込む
+        labels = {}
+        self.region_map = create_labels(width, height, self.backend)
+        for i, rect in enumerate(rects):
+            if rect is None:
+                continue
+            label = labels.setdefault(find(i), len(labels))
+            fill_labels(self.region_map, width, rect, label)
+        self.room_regions = [labels[find(i)] if rect is not None else -1 for i, rect in enumerate(room_rects)]
+        
+        # 床の索引（連結成分ごとの矩形と面積の累積和）。床のタイルを列挙せずにランダムに選ぶのに使う
+        region_rects = {None: []}
+        for i, rect in enumerate(rects):
+            if rect is not None:
+                region_rects[None].append(rect)
+                region_rects.setdefault(labels[find(i)], []).append(rect)
+        self.floor_index = {}
+        for label, members in region_rects.items():
+            cumulative = []
+            total = 0
+            for _, _, w, h in members:
+                total += w * h
+                cumulative.append(total)
+            self.floor_index[label] = (members, cumulative)
+        
+        # タイル -> 部屋番号（部屋が重なる場合は先の部屋を優先）
+        self.room_map = create_labels(width, height, self.backend)
+        for i in reversed(range(len(room_rects))):
+            if room_rects[i] is not None:
+                fill_labels(self.room_map, width, room_rects[i], i)
+
+    def random_floor_tile(self, rng, region=None):
+        """
+        床（部屋・通路）のタイルを一様にランダムに選ぶ。マップ全体を走査せず、床の索引の矩形から選ぶ。
+        矩形の重なっている部分は重なっている数だけ選ばれやすくなるので、その分だけ選び直して一様にする。
+        階段などに書き換えたタイルも歩けるタイルなので選ばれうる。
+        
+        Args:
+            rng (random.Random): 乱数生成器
+            region (int): 連結成分の番号（region_at の値）。指定した場合はその成分の中から選ぶ
+            
+        Returns:
+            tuple or None: タイル座標 (x, y)。床がなければ None
+        """
+        rects, cumulative = self.floor_index.get(region, ((), ()))
+        if not rects:
+            return None
+        while True:
+            # 面積に比例して矩形を選び、その中の1タイルを選ぶ
+            i = bisect.bisect_right(cumulative, rng.randrange(cumulative[-1]))
+            x, y, w, h = rects[i]
+            x += rng.randrange(w)
+            y += rng.randrange(h)
+            covering = sum(1 for rx, ry, rw, rh in rects if rx <= x < rx + rw and ry <= y < ry + rh)
+            if covering == 1 or rng.randrange(covering) == 0:
+                return x, y
+
+    def region_at(self, x, y):
+        """タイルの連結成分の番号を返す。壁なら -1"""
+        return int(self.region_map[y * self.width + x])
+
+    def room_at(self, x, y):
+        """タイルがある部屋の番号（self.rooms のインデックス）を返す。部屋の外なら -1"""
+        return int(self.room_map[y * self.width + x])
+
+
+def _clip_rect(rect, width, height):
+    """矩形 (x, y, w, h) をマップ内に切り詰める。マップ外なら None"""
+    x, y, w, h = rect
+    x0, x1 = max(0, x), min(width, x + w)
+    y0, y1 = max(0, y), min(height, y + h)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+def _rects_touch(a, b):
+    """2つの矩形が重なっているか、辺で接している（上下左右に移動できる）か"""
+    if a is None or b is None:
+        return False
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    overlap_x = ax < bx + bw and bx < ax + aw
+    overlap_y = ay < by + bh and by < ay + ah
+    touch_x = ax <= bx + bw and bx <= ax + aw # 重なり、または左右に隣接
+    touch_y = ay <= by + bh and by <= ay + ah # 重なり、または上下に隣接
+    return (overlap_x and touch_y) or (overlap_y and touch_x)
+
+
+def _generate_packed(args):
+    """ワーカープロセスで1マップ生成し、プロセス間で受け渡しやすい形にして返す"""
+    width, height, seed = args
+    generator = DungeonGenerator(backend="list", seed=seed)
+    map_data = generator.generate_map(width, height)
+    return seed, pack_map(map_data), generator.rooms
+
+
+def generate_batch(width, height, seeds, max_workers=None):
+    """
+    複数のダンジョンをプロセスプールで並列に生成する。
+    各マップは seed だけで決まるので、ワーカー数や実行順に関係なく同じ結果になる。
+    
+    Args:
+        width (int): マップの幅（タイル数）
+        height (int): マップの高さ（タイル数）
+        seeds (list[int]): マップごとの乱数シード
+        max_workers (int): ワーカープロセス数（None なら CPU コア数）
+        
+    Returns:
+        list[tuple]: seeds と同じ順の (seed, packed_map, rooms) のリスト。
+            packed_map は grid.pack_map 形式の bytes（grid.unpack_map で復元できる）、
+            rooms は部屋のリスト [(x, y, w, h), ...]
+    """
+    seeds = list(seeds)
+    if not seeds:
+        return []
+    
+    workers = max_workers or os.cpu_count() or 1
+    # 1マップは軽いので、ある程度まとめてワーカーに渡してプロセス間通信を減らす
+    chunksize = max(1, len(seeds) // (workers * 4))
+    tasks = [(width, height, seed) for seed in seeds]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_generate_packed, tasks, chunksize=chunksize))
@@ -0,0 +1,345 @@
+import random
+from concurrent.futures import Future, ThreadPoolExecutor
+from src.settings import MAP_COLS, MAP_ROWS, TILE_STAIRS, ENEMY_PATHFINDING, ENEMY_PATH_MAX_DISTANCE, ENEMY_PHASE, FLOOR_PREFETCH, SAVE_PATH
+from src.entities import Player, Enemy, OccupancyIndex
+from src.dungeon import DungeonGenerator
+from src.pathfinding import DistanceMap, HierarchicalPathfinder
+from src.fov import FieldOfView
+from src.save import write_save, read_save
+from src.profiling import PROFILER
+from src.messages import MessageLog
+from src import batched
+
+# 行動 (dx, dy)
+ACTION_UP = (0, -1)
+ACTION_DOWN = (0, 1)
+ACTION_LEFT = (-1, 0)
+ACTION_RIGHT = (1, 0)
+ACTIONS = [ACTION_UP, ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT]
+
+
+class Floor:
+    """生成済みの1階層分のデータ（まだゲームに反映されていないもの）"""
+    def __init__(self, dungeon_generator, player_pos, enemies, fov, hierarchical_pathfinder=None, distance_map=None,
+                 walkable=None):
+        self.dungeon_generator = dungeon_generator # マップを生成した DungeonGenerator（部屋・連結成分などを持つ）
+        self.map_data = dungeon_generator.map_data
+        self.player_pos = player_pos # プレイヤーの初期位置 (床がなければ None)
+        self.enemies = enemies
+        self.fov = fov # 階層の視界（壁の情報は生成時に作っておく）
+        # 階層的経路探索のグラフ (ENEMY_PATHFINDING = "hierarchical" のとき生成時に作っておく。なければ None)
+        self.hierarchical_pathfinder = hierarchical_pathfinder
+        self.distance_map = distance_map # 敵が共有する距離マップ (ENEMY_PATHFINDING = "distance_map" のとき。なければ None)
+        self.walkable = walkable # 壁でないタイルの NumPy 配列 (ENEMY_PHASE = "batched" のとき。なければ None)
+
+
+class GameEngine:
+    """
+    ゲームの状態（マップ・プレイヤー・敵）とターン処理をまとめたクラス。
+    pygame には依存しないので、画面なしでバランス調整用のシミュレーションやボットを回せる。
+    描画と入力は src/game.py の Game が担当する。
+    """
+    def __init__(self, width=MAP_COLS, height=MAP_ROWS, prefetch=FLOOR_PREFETCH):
+        self.width = width # マップの幅（タイル数）
+        self.height = height # マップの高さ（タイル数）
+        self.floor = None
+        self.dungeon_generator = None
+        self.map_data = None
+        self.fov = None # プレイヤーの視界（見えている・見たことがあるタイル。必要になったときに update_fov で計算する）
+        self.distance_map = None # 敵が共有する距離マップ（階層の生成時に作り、ターンごとに計算し直す）
+        self.hierarchical_pathfinder = None # 階層的経路探索のグラフ（階層の生成時に作る）
+        self.walkable = None # 壁でないタイルの NumPy 配列 (ENEMY_PHASE = "batched" 用、階層の生成時に作る)
+        self.seed = None # ゲームの乱数シード (new_game で決まる)
+        self.rng = None # 敵の行動用の乱数生成器
+        self.batch_rng = None # ENEMY_PHASE = "batched" 用の乱数生成器
+        self.player = None
+        self.enemies = []
+        self.occupancy = OccupancyIndex() # タイル座標 -> エンティティ
+        self.game_over = False
+        self.messages = MessageLog() # 戦闘などのメッセージ（UI領域に表示する）
+        
+        # 次の階層の先読み（プレイ中にワーカースレッドで生成しておく）
+        self.prefetch = prefetch
+        self._executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        self._next_floor = None # 先読み中の Future
+
+    def new_game(self, seed=None):
+        """
+        ゲームを開始する（マップ生成とプレイヤー配置）。
+        ダンジョン・敵の配置・敵の行動はすべて seed から決まる（省略時はランダムに選ぶ）ので、
+        同じ seed で同じ行動を与えればゲームを再現できる (src/replay.py)。
+        """
+        self.seed = seed if seed is not None else random.randrange(1 << 63)
+        self.rng = random.Random(self.seed) # 敵の行動用
+        self.batch_rng = None
+        self.floor = 1
+        self.game_over = False
+        self.player = None
+        self.messages.clear()
+        self._enter_floor(self._build_floor(self.floor))
+
+    def next_level(self):
+        """次の階層へ進む。先読み済みの階層があればそれに切り替える。"""
+        self.floor += 1
+        self.messages.info(f"Advance to level {self.floor}")
+        with PROFILER.span("next_level"):
+            if self._next_floor is not None:
+                floor = self._next_floor.result() # 生成が終わっていなければここで待つ
+            else:
+                floor = self._build_floor(self.floor)
+            self._enter_floor(floor)
+
+    def save(self, path=SAVE_PATH):
+        """
+        ゲームの状態をファイルに保存する。
+        先読み済みの次の階層も一緒に保存するので、読み込んだ後に階段を降りても生成し直さずに済む。
+        """
+        floors = [Floor(self.dungeon_generator, (self.player.x, self.player.y), self.enemies, self.fov)]
+        next_floor = self._next_floor
+        if next_floor is not None and next_floor.done() and next_floor.exception() is None:
+            floors.append(next_floor.result())
+        write_save(path, self.seed, self.floor, self.game_over, self.player, floors)
+        self.messages.info(f"Saved to {path}")
+
+    def load(self, path=SAVE_PATH):
+        """
+        save() で保存した状態を読み込む。
+
+        Raises:
+            OSError: ファイルが読めない場合
+            ValueError: セーブデータでない、またはバージョンが違う場合
+        """
+        data = read_save(path)
+        floors = [Floor(*floor) for floor in data.floors]
+        # 以降の階層はセーブしたゲームのシードから生成する（敵の行動の乱数は読み込み時点から振り直す）
+        self.seed = data.seed
+        self.rng = random.Random(f"{data.seed}:load:{data.floor_number}")
+        self.batch_rng = None
+        self.floor = data.floor_number
+        self.game_over = data.game_over
+        self.player = data.player
+        self._enter_floor(floors[0], floors[1] if len(floors) > 1 else None)
+        self.messages.info(f"Loaded from {path}")
+
+    def _enter_floor(self, floor, next_floor=None):
+        """
+        生成済みの階層を現在の階層にし、次の階層の先読みを開始する。
+        next_floor（セーブデータから読み込んだ次の階層など）が渡された場合はそれを次の階層にする。
+        """
+        self.dungeon_generator = floor.dungeon_generator
+        self.map_data = floor.map_data
+        self.fov = floor.fov
+        self.distance_map = floor.distance_map
+        self.hierarchical_pathfinder = floor.hierarchical_pathfinder
+        self.walkable = floor.walkable
+
+        # 既存の敵を全て削除
+        for enemy in self.enemies:
+            enemy.kill()
+        self.enemies = floor.enemies
+
+        # プレイヤーを初期位置に配置
+        if self.player is None:
+            start_pos = floor.player_pos or (1, 1) # 床がなければフォールバック
+            self.player = Player(start_pos[0], start_pos[1])
+        elif floor.player_pos is not None:
+            self.player.x, self.player.y = floor.player_pos
+
+        # 位置の索引を作り直す
+        self.occupancy.clear()
+        self.occupancy.add(self.player)
+        for enemy in self.enemies:
+            self.occupancy.add(enemy)
+
+        if next_floor is not None:
+            self._next_floor = Future()
+            self._next_floor.set_result(next_floor)
+        elif self._executor is not None:
+            self._next_floor = self._executor.submit(self._build_floor, self.floor + 1)
+        else:
+            self._next_floor = None
+
+    def _build_floor(self, level):
+        """
+        ダンジョンを生成し、プレイヤーの初期位置・階段・敵を決める。
+        現在の階層の状態には触れないので、ワーカースレッドからも呼び出せる。
+        乱数はゲームのシードと階層から作るので、先読みのタイミングによらず同じ階層になる。
+        
+        Args:
+            level (int): 生成する階層
+        
+        Returns:
+            Floor: 生成した階層
+        """
+        rng = random.Random(f"{self.seed}:{level}")
+        generator = DungeonGenerator(seed=rng.getrandbits(64))
+        with PROFILER.span("build_floor.generate"):
+            map_data = generator.generate_map(self.width, self.height)
+
+        # プレイヤーの初期位置をランダムな床の上に設定（床の索引から選ぶので、マップ全体は走査しない）
+        player_pos = generator.random_floor_tile(rng)
+
+        # 階段の配置（プレイヤーが必ずたどり着ける、同じ連結成分の床に置く）
+        if player_pos is not None:
+            player_region = generator.region_at(*player_pos)
+            stairs_x, stairs_y = generator.random_floor_tile(rng, player_region)
+            map_data[stairs_y][stairs_x] = TILE_STAIRS
+
+        # 敵の生成
+        with PROFILER.span("build_floor.spawn"):
+            enemies = self._spawn_enemies(generator, player_pos or (1, 1), rng)
+        
+        # 敵の経路探索・行動判定に使う階層ごとのデータも先読みスレッドで作っておく
+        # （階段を降りた後の最初の敵のターンでメインスレッドが作らずに済む）
+        hierarchical_pathfinder = None
+        distance_map = None
+        if ENEMY_PATHFINDING == "hierarchical":
+            with PROFILER.span("build_floor.hierarchical"):
+                hierarchical_pathfinder = HierarchicalPathfinder(generator)
+        elif ENEMY_PATHFINDING == "distance_map":
+            with PROFILER.span("build_floor.distance_map"):
+                distance_map = DistanceMap(map_data)
+        walkable = batched.walkable_array(map_data) if ENEMY_PHASE == "batched" else None
+        return Floor(generator, player_pos, enemies, FieldOfView(map_data), hierarchical_pathfinder, distance_map, walkable)
+
+    def _spawn_enemies(self, generator, player_pos, rng):
+        """各部屋に敵を配置する（プレイヤーのいる部屋と、プレイヤーがたどり着けない部屋を除く）"""
+        rooms = generator.rooms
+        player_region = generator.region_at(*player_pos)
+        enemies = []
+
+        # プレイヤーがどの部屋にいるか特定（部屋の外なら -1）
+        player_room_index = generator.room_at(*player_pos)
+
+        # 部屋ごとに敵を配置
+        for i, room in enumerate(rooms):
+            if i == player_room_index:
+                continue # プレイヤーのいる部屋には敵を置かない
+            if generator.room_regions[i] != player_region:
+                continue # 通路がつながっていない部屋には置かない
+
+            # 一定の確率で敵を配置
+            if rng.random() < 0.8:
+                rx, ry, rw, rh = room
+                # 部屋の中のランダムな位置
+                ex = rx + rng.randint(0, rw - 1)
+                ey = ry + rng.randint(0, rh - 1)
+                enemies.append(Enemy(ex, ey))
+        return enemies
+
+    def _chase_pathfinding(self, has_chasers):
+        """
+        追跡する敵が共有する経路探索の情報 (distance_map, pathfinder) を用意する。
+        距離マップはターンに1回だけ計算し、全ての敵で共有する（追跡する敵がいなければどちらも用意しない）。
+        """
+        distance_map = None
+        pathfinder = None
+        if ENEMY_PATHFINDING == "distance_map" and has_chasers:
+            if self.distance_map is None:
+                # セーブデータから読み込んだ階層など、生成時に作っていなければ最初に追跡するときに作る
+                self.distance_map = DistanceMap(self.map_data)
+            distance_map = self.distance_map
+            with PROFILER.span("distance_map"):
+                distance_map.compute((self.player.x, self.player.y), ENEMY_PATH_MAX_DISTANCE)
+        elif ENEMY_PATHFINDING == "hierarchical" and has_chasers:
+            if self.hierarchical_pathfinder is None:
+                # セーブデータから読み込んだ階層など、生成時に作っていなければ最初に追跡するときに作る
+                self.hierarchical_pathfinder = HierarchicalPathfinder(self.dungeon_generator)
+            pathfinder = self.hierarchical_pathfinder
+        return distance_map, pathfinder
+
+    def step(self, action):
+        """
+        プレイヤーの行動を1つ処理し、ターンを進める。
+
+        Args:
+            action (tuple): 移動方向 (dx, dy)。敵がいる方向なら攻撃になる
+
+        Returns:
+            bool: ターンを消費したかどうか（壁への移動やゲームオーバー時は False）
+        """
+        if self.game_over:
+            return False
+
+        dx, dy = action
+        if dx == 0 and dy == 0:
+            return False
+
+        # まず「移動予定の座標（タイル座標）」を計算
+        target_x = self.player.x + dx
+        target_y = self.player.y + dy
+
+        # 移動先に敵がいるか確認
+        target_enemy = self.occupancy.get(target_x, target_y)
+
+        # 敵がいる場合: 攻撃 / いない場合: 移動
+        if target_enemy is not None:
+            target_enemy.hp -= self.player.attack_power
+            self.messages.info(f"Player attacks Enemy! ({self.player.attack_power} damage)")
+            self.messages.debug(f"Enemy HP: {target_enemy.hp}")
+            if target_enemy.hp <= 0:
+                target_enemy.kill()
+                self.enemies.remove(target_enemy)
+                self.messages.info("Enemy defeated!")
+            self._enemy_turn()
+            return True
+
+        # 通常移動（移動できたかどうかでターン消費を決める）
+        before_x, before_y = self.player.x, self.player.y
+        self.player.move(dx, dy, self.map_data)
+        if (self.player.x, self.player.y) == (before_x, before_y):
+            return False
+
+        # 移動先が階段かチェック
+        if self.map_data[self.player.y][self.player.x] == TILE_STAIRS:
+            self.next_level()
+        else:
+            self._enemy_turn()
+        return True
+
+    def update_fov(self):
+        """
+        プレイヤーの視界を今の位置で計算し直す（位置が前回の計算から変わっていなければ何もしない）。
+        視界は移動のたびには計算せず、描画する側 (Game.update) と、索敵範囲内に敵がいるときの敵のターンで呼ぶ。
+        画面なしのシミュレーションでは、敵が近くにいないターンのシャドウキャスティングを省ける。
+        """
+        self.fov.compute(self.player.x, self.player.y)
+
+    def _enemy_turn(self):
+        """敵の行動フェーズ（移動と、プレイヤーに隣接している敵の攻撃）"""
+        player_x, player_y = self.player.x, self.player.y
+
+        # 索敵範囲（マンハッタン距離）に敵がいるときだけ、気づくかどうかの判定に視界が要る
+        if any(abs(enemy.x - player_x) + abs(enemy.y - player_y) <= enemy.sight_range for enemy in self.enemies):
+            self.update_fov()
+
+        with PROFILER.span("enemy_turn"):
+            if ENEMY_PHASE == "batched":
+                # 行動判定とランダム移動は NumPy でまとめて処理し、追跡する敵だけ1体ずつ経路を求める
+                if self.batch_rng is None:
+                    self.batch_rng = batched.create_rng(self.seed)
+                if self.walkable is None:
+                    # セーブデータから読み込んだ階層など、生成時に作っていなければここで作る
+                    self.walkable = batched.walkable_array(self.map_data)
+                chasers = batched.update_enemies(self.enemies, self.walkable, player_x, player_y, self.batch_rng, self.fov)
+                distance_map, pathfinder = self._chase_pathfinding(bool(chasers))
+                region_map = self.dungeon_generator.region_map
+                for enemy in chasers:
+                    enemy.chase(self.map_data, player_x, player_y, distance_map, region_map, pathfinder)
+            else:
+                fov = self.fov
+                in_sight = any(enemy.can_see(player_x, player_y, fov) for enemy in self.enemies)
+                distance_map, pathfinder = self._chase_pathfinding(in_sight)
+                region_map = self.dungeon_generator.region_map
+                for enemy in self.enemies:
+                    enemy.update(self.map_data, player_x, player_y, distance_map, region_map, pathfinder, fov, self.rng)
+
+        # 敵の移動後、プレイヤーに隣接している敵がいれば攻撃（上下左右）
+        messages = self.messages
+        for enemy in self.occupancy.neighbors(player_x, player_y):
+            self.player.hp -= enemy.attack_power
+            messages.info(f"Enemy attacks Player! ({enemy.attack_power} damage)")
+            messages.debug(f"Player HP: {self.player.hp}")
+            if self.player.hp <= 0:
+                self.game_over = True
+                messages.warning("Game Over!")
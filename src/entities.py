@@ -1,85 +1,190 @@
-import pygame
 import random
-from src.settings import TILE_SIZE, RED, TILE_FLOOR, TILE_WALL, TILE_STAIRS, PLAYER_HP, ENEMY_HP, PLAYER_ATTACK_POWER, ENEMY_ATTACK_POWER, ENEMY_SIGHT_RANGE, ENEMY_ACT_CHANCE
-from src.pathfinding import get_next_step
-
-class Player(pygame.sprite.Sprite):
-    def __init__(self, x, y, image):
-        super().__init__()
-        self.image = image # プレイヤーの画像
-        self.rect = self.image.get_rect() # プレイヤーの位置とサイズを管理する矩形
-        self.rect.x = x * TILE_SIZE # 初期位置をタイルサイズに基づいて設定
-        self.rect.y = y * TILE_SIZE 
-        self.max_hp = PLAYER_HP
+from src.settings import TILE_WALL, PLAYER_HP, ENEMY_HP, PLAYER_ATTACK_POWER, ENEMY_ATTACK_POWER, ENEMY_SIGHT_RANGE, ENEMY_ACT_CHANCE, ENEMY_PATH_MAX_DISTANCE, ENEMY_PATH_CACHE
+from src.pathfinding import get_next_step, get_next_step_from_distance_map, PathCache
+
+# NOTE: エンティティは pygame に依存しない（位置はタイル座標で管理する）。
+# 描画用のスプライトは src/sprites.py の EntitySprite がエンティティを参照して作る。
+
+class OccupancyIndex:
+    """
+    タイル座標 -> エンティティ の索引。
+    「このタイルに誰がいるか」「プレイヤーの隣に誰がいるか」を敵の数によらず O(1) で調べる。
+    エンティティの移動 (Entity.move_to) と kill() で自動的に更新される。
+    """
+    def __init__(self):
+        self._tiles = {}
+
+    def add(self, entity):
+        """エンティティを索引に登録する"""
+        self._tiles[(entity.x, entity.y)] = entity
+        entity.occupancy = self
+
+    def remove(self, entity):
+        """エンティティを索引から外す"""
+        if self._tiles.get((entity.x, entity.y)) is entity:
+            del self._tiles[(entity.x, entity.y)]
+        entity.occupancy = None
+
+    def move(self, entity, x, y):
+        """エンティティの位置を更新する"""
+        if self._tiles.get((entity.x, entity.y)) is entity:
+            del self._tiles[(entity.x, entity.y)]
+        self._tiles[(x, y)] = entity
+
+    def clear(self):
+        """すべてのエンティティを索引から外す"""
+        for entity in self._tiles.values():
+            entity.occupancy = None
+        self._tiles = {}
+
+    def get(self, x, y):
+        """タイル上のエンティティを返す（いなければ None）"""
+        return self._tiles.get((x, y))
+
+    def neighbors(self, x, y):
+        """上下左右に隣接するタイル上のエンティティのリストを返す"""
+        tiles = self._tiles
+        neighbors = []
+        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+            entity = tiles.get((x + dx, y + dy))
+            if entity is not None:
+                neighbors.append(entity)
+        return neighbors
+
+
+class Entity:
+    """
+    マップ上のキャラクターの基底クラス。
+    1階層に大量の敵を置いてもメモリ使用量が読めるように、__slots__ で属性を固定している。
+    """
+    __slots__ = ("x", "y", "max_hp", "hp", "attack_power", "is_alive", "occupancy")
+
+    def __init__(self, x, y, max_hp, attack_power):
+        self.x = x # タイル座標
+        self.y = y
+        self.max_hp = max_hp
         self.hp = self.max_hp
-        self.attack_power = PLAYER_ATTACK_POWER
+        self.attack_power = attack_power
         self.is_alive = True
+        self.occupancy = None # 登録されている OccupancyIndex
+
+    def move_to(self, x, y):
+        """指定したタイルに移動する（索引に登録されていれば索引も更新する）"""
+        if self.occupancy is not None:
+            self.occupancy.move(self, x, y)
+        self.x = x
+        self.y = y
+
+    def is_blocked(self, x, y):
+        """タイルに他のエンティティがいるかどうか"""
+        if self.occupancy is None:
+            return False
+        other = self.occupancy.get(x, y)
+        return other is not None and other is not self
+
+    def kill(self):
+        """倒されたことを記録し、索引から外す（エンジンやスプライトはこのフラグを見て取り除く）"""
+        self.is_alive = False
+        if self.occupancy is not None:
+            self.occupancy.remove(self)
+
+
+class Player(Entity):
+    __slots__ = ()
+
+    def __init__(self, x, y):
+        super().__init__(x, y, PLAYER_HP, PLAYER_ATTACK_POWER)
 
     def move(self, dx, dy, map_data):
         """プレイヤーを移動させる。移動先が壁でなければ移動可能。"""
-        new_x = self.rect.x + dx * TILE_SIZE # 新しい座標
-        new_y = self.rect.y + dy * TILE_SIZE
-        tile_x = new_x // TILE_SIZE # 座標に対応するタイル配列のインデックス
-        tile_y = new_y // TILE_SIZE
-        if 0 <= tile_y < len(map_data) and 0 <= tile_x < len(map_data[0]) and map_data[tile_y][tile_x] != TILE_WALL: # タイルがマップ内かつ壁でないか確認
-            self.rect.x = new_x
-            self.rect.y = new_y
-
-
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, x, y, image):
-        super().__init__()
-        self.image = image # 敵の画像
-        self.rect = self.image.get_rect() # 敵の位置とサイズを管理する矩形
-        self.rect.x = x * TILE_SIZE # 初期位置をタイルサイズに基づいて設定
-        self.rect.y = y * TILE_SIZE
-        self.max_hp = ENEMY_HP
-        self.hp = self.max_hp
-        self.attack_power = ENEMY_ATTACK_POWER
+        new_x = self.x + dx # 移動先のタイル座標
+        new_y = self.y + dy
+        if 0 <= new_y < len(map_data) and 0 <= new_x < len(map_data[0]) and map_data[new_y][new_x] != TILE_WALL: # タイルがマップ内かつ壁でないか確認
+            self.move_to(new_x, new_y)
+
+
+class Enemy(Entity):
+    __slots__ = ("sight_range", "act_chance", "path_max_distance", "path_cache")
+
+    def __init__(self, x, y):
+        super().__init__(x, y, ENEMY_HP, ENEMY_ATTACK_POWER)
         self.sight_range = ENEMY_SIGHT_RANGE
         self.act_chance = ENEMY_ACT_CHANCE
-        self.is_alive = True
-    
-    def update(self, map_data, player_x, player_y):
-        """索敵範囲内ならA*で追跡、範囲外ならランダム移動。一定確率で行動する。"""
+        self.path_max_distance = ENEMY_PATH_MAX_DISTANCE # 追跡する経路長の上限
+        self.path_cache = None # 前回の経路（A*のときに使い回す。初めて追跡するときに作る）
+
+    def update(self, map_data, player_x, player_y, distance_map=None, region_map=None, pathfinder=None, fov=None,
+               rng=random):
+        """
+        プレイヤーに気づいていれば追跡、気づいていなければランダム移動。一定確率で行動する。
+        distance_map が渡された場合はそれを参照して次の1歩を決め、pathfinder（HierarchicalPathfinder）が
+        渡された場合はそれで探索し、どちらもなければA*で探索する。
+        region_map が渡された場合、到達できないプレイヤーへの探索は省略する。
+        fov（プレイヤーの FieldOfView）が渡された場合、プレイヤーから見えない位置にいる敵は気づかない。
+        rng は行動確率とランダム移動に使う乱数生成器（random.Random。省略時は random モジュール）。
+        """
         # 行動確率チェック
-        if random.random() > self.act_chance:
+        if rng.random() > self.act_chance:
             return  # 行動しない
-        
-        current_x = self.rect.x // TILE_SIZE
-        current_y = self.rect.y // TILE_SIZE
-
-        # プレイヤーとの距離を計算（マンハッタン距離）
-        distance = abs(current_x - player_x) + abs(current_y - player_y)
-        
-        if distance > self.sight_range:
+
+        if self.can_see(player_x, player_y, fov):
+            # 索敵範囲内：追跡
+            self.chase(map_data, player_x, player_y, distance_map, region_map, pathfinder)
+        else:
             # 索敵範囲外：ランダム移動
-            directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-            random.shuffle(directions)
-            
-            for dx, dy in directions:
-                new_x = current_x + dx
-                new_y = current_y + dy
-                
-                # マップ範囲内かつ壁でないかチェック
-                if 0 <= new_y < len(map_data) and 0 <= new_x < len(map_data[0]):
-                    if map_data[new_y][new_x] != TILE_WALL:
-                        self.rect.x = new_x * TILE_SIZE
-                        self.rect.y = new_y * TILE_SIZE
-                        break  # 移動成功したらループを抜ける
+            self.wander(map_data, rng)
+
+    def can_see(self, player_x, player_y, fov=None):
+        """
+        プレイヤーに気づくかどうか。索敵範囲内（マンハッタン距離）で、
+        fov が渡された場合はさらにプレイヤーの視界に入っている（視線が壁で遮られていない）必要がある。
+        """
+        if abs(self.x - player_x) + abs(self.y - player_y) > self.sight_range:
+            return False
+        return fov is None or fov.is_visible(self.x, self.y)
+
+    def wander(self, map_data, rng=random):
+        """ランダムな方向に1歩移動する"""
+        current_x = self.x
+        current_y = self.y
+        directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        rng.shuffle(directions)
+
+        for dx, dy in directions:
+            new_x = current_x + dx
+            new_y = current_y + dy
+
+            # マップ範囲内かつ壁でなく、他のエンティティもいないかチェック
+            if 0 <= new_y < len(map_data) and 0 <= new_x < len(map_data[0]):
+                if map_data[new_y][new_x] != TILE_WALL and not self.is_blocked(new_x, new_y):
+                    self.move_to(new_x, new_y)
+                    break  # 移動成功したらループを抜ける
+
+    def chase(self, map_data, player_x, player_y, distance_map=None, region_map=None, pathfinder=None):
+        """プレイヤーに向かって1歩移動する（距離マップ（共有）またはパスファインディングで追跡）"""
+        current_x = self.x
+        current_y = self.y
+        if distance_map is not None:
+            next_pos = get_next_step_from_distance_map((current_x, current_y), distance_map)
+        elif pathfinder is not None:
+            next_pos = pathfinder.get_next_step((current_x, current_y), (player_x, player_y), self.path_max_distance)
+        elif ENEMY_PATH_CACHE:
+            if self.path_cache is None:
+                self.path_cache = PathCache()
+            next_pos = self.path_cache.get_next_step((current_x, current_y), (player_x, player_y), map_data,
+                                                     self.path_max_distance, region_map)
         else:
-            # 索敵範囲内：A*パスファインディングで追跡
-            next_pos = get_next_step((current_x, current_y), (player_x, player_y), map_data)
-            
-            if next_pos is None:
-                return  # 経路が見つからない場合は動かない
-            
-            new_x, new_y = next_pos
-            
-            # 移動先にプレイヤーがいる場合は移動しない（重ならないようにする）
-            if new_x == player_x and new_y == player_y:
-                return
-            
-            # 移動
-            self.rect.x = new_x * TILE_SIZE
-            self.rect.y = new_y * TILE_SIZE
\ No newline at end of file
+            next_pos = get_next_step((current_x, current_y), (player_x, player_y), map_data,
+                                     self.path_max_distance, region_map)
+
+        if next_pos is None:
+            return  # 経路が見つからない場合は動かない
+
+        new_x, new_y = next_pos
+
+        # 移動先にプレイヤーや他の敵がいる場合は移動しない（重ならないようにする）
+        if (new_x == player_x and new_y == player_y) or self.is_blocked(new_x, new_y):
+            return
+
+        # 移動
+        self.move_to(new_x, new_y)
@@ -0,0 +1,124 @@
+"""
+視界 (FOV: Field of View) の計算。
+再帰的シャドウキャスティング（8つの八分円ごとに、壁が作る影の傾きの範囲を行単位で追っていく方法）で
+プレイヤーから見えるタイルを求め、「今見えている」「一度でも見た」をタイルごとのフラグで持つ。
+描画（見たことのあるタイルだけ描く）と敵の索敵（プレイヤーから見える位置にいる敵だけが気づく）の両方で使う。
+"""
+from src.settings import TILE_WALL, FOV_RADIUS
+from src.grid import pack_map
+
+# 八分円ごとの座標変換 (xx, xy, yx, yy)
+OCTANTS = [
+    (1, 0, 0, -1), (0, 1, -1, 0), (0, -1, -1, 0), (-1, 0, 0, -1),
+    (-1, 0, 0, 1), (0, -1, 1, 0), (0, 1, 1, 0), (1, 0, 0, 1),
+]
+
+# タイル値 -> 視線を遮るか (bytes.translate 用の変換表)
+OPAQUE_TABLE = bytes(1 if tile == TILE_WALL else 0 for tile in range(256))
+
+
+class FieldOfView:
+    """
+    1階層分の視界。壁かどうか (opaque) は作成時に1回だけマップから作り、階層の間使い回す。
+    visible / explored は width * height の bytearray（インデックスは y * width + x）。
+    compute() はプレイヤーの位置が変わったときだけ計算し直し、
+    前回見えていたタイルだけを消すので、マップの大きさではなく視界の広さに比例した時間で済む。
+    """
+    def __init__(self, map_data, radius=FOV_RADIUS):
+        self.height = len(map_data)
+        self.width = len(map_data[0]) if self.height > 0 else 0
+        self.radius = radius # 視界の半径（タイル数）
+        self.opaque = bytearray(pack_map(map_data).translate(OPAQUE_TABLE))
+        self.visible = bytearray(self.width * self.height)
+        self.explored = bytearray(self.width * self.height)
+        self.origin = None # 前回計算したときの視点
+        self.version = 0 # 計算し直すたびに増える（描画側のキャッシュの更新判定用）
+        self._lit = [] # visible が立っているインデックス
+
+    def is_visible(self, x, y):
+        """タイルが今見えているかどうか"""
+        return 0 <= x < self.width and 0 <= y < self.height and self.visible[y * self.width + x] != 0
+
+    def is_explored(self, x, y):
+        """タイルを一度でも見たことがあるかどうか"""
+        return 0 <= x < self.width and 0 <= y < self.height and self.explored[y * self.width + x] != 0
+
+    def compute(self, x, y):
+        """
+        (x, y) から見えるタイルを計算する。前回と同じ視点なら何もしない。
+
+        Returns:
+            bool: 計算し直したかどうか
+        """
+        if self.origin == (x, y):
+            return False
+
+        visible = self.visible
+        for index in self._lit:
+            visible[index] = 0
+        self._lit = []
+
+        self._light(x, y)
+        for xx, xy, yx, yy in OCTANTS:
+            self._cast_light(x, y, xx, xy, yx, yy)
+
+        self.origin = (x, y)
+        self.version += 1
+        return True
+
+    def _light(self, x, y):
+        """タイルを見えている・見たことがあるにする"""
+        index = y * self.width + x
+        if not self.visible[index]:
+            self.visible[index] = 1
+            self.explored[index] = 1
+            self._lit.append(index)
+
+    def _cast_light(self, origin_x, origin_y, xx, xy, yx, yy):
+        """1つの八分円について、壁の影になっていないタイルを照らす"""
+        width, height = self.width, self.height
+        opaque = self.opaque
+        radius = self.radius
+        radius_squared = radius * radius
+
+        # (開始する行, 照らす傾きの範囲の開始, 終了)。壁で範囲が分かれたら後で続きを処理する
+        stack = [(1, 1.0, 0.0)]
+        while stack:
+            row, start, end = stack.pop()
+            if start < end:
+                continue
+            new_start = start
+            for distance in range(row, radius + 1):
+                dx = -distance - 1
+                dy = -distance
+                blocked = False
+                while dx <= 0:
+                    dx += 1
+                    x = origin_x + dx * xx + dy * xy
+                    y = origin_y + dx * yx + dy * yy
+                    left_slope = (dx - 0.5) / (dy + 0.5)
+                    right_slope = (dx + 0.5) / (dy - 0.5)
+                    if start < right_slope:
+                        continue
+                    if end > left_slope:
+                        break
+
+                    # マップ外は壁として扱う
+                    inside = 0 <= x < width and 0 <= y < height
+                    if inside and dx * dx + dy * dy < radius_squared:
+                        self._light(x, y)
+                    is_opaque = not inside or opaque[y * width + x]
+
+                    if blocked:
+                        if is_opaque:
+                            new_start = right_slope
+                            continue
+                        blocked = False
+                        start = new_start
+                    elif is_opaque and distance < radius:
+                        # 壁の手前までの範囲は次の行から別に処理する
+                        blocked = True
+                        stack.append((distance + 1, start, left_slope))
+                        new_start = right_slope
+                if blocked:
+                    break
@@ -1,146 +1,288 @@
 import pygame
 import sys
-import random
 import os
-from src.settings import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, BLACK, WHITE, YELLOW, MOVE_DELAY, COLS, ROWS, TILE_SIZE, TILE_FLOOR, TILE_WALL, TILE_STAIRS, UI_HEIGHT
-from src.entities import Player, Enemy
-from src.dungeon import DungeonGenerator
+from src.settings import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, BLACK, WHITE, RED, YELLOW, COLS, ROWS, TILE_SIZE, TILE_FLOOR, TILE_WALL, TILE_STAIRS, UI_HEIGHT, MESSAGE_LOG_LINES, FOG_ALPHA, RENDER_MODE, LOOP_MODE, EVENT_WAIT_TIMEOUT, REPLAY_RECORD_DIR
+from src.engine import GameEngine, ACTION_UP, ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT
+from src.sprites import EntitySprite
+from src.text import TextCache
+from src.assets import AssetManager
+from src.replay import TurnRecorder
+from src.profiling import PROFILER
+from src.messages import DEBUG, WARNING
+
+# キー入力とプレイヤーの行動の対応
+KEY_ACTIONS = {
+    pygame.K_LEFT: ACTION_LEFT,
+    pygame.K_RIGHT: ACTION_RIGHT,
+    pygame.K_UP: ACTION_UP,
+    pygame.K_DOWN: ACTION_DOWN,
+}
 
 class Game:
-    def __init__(self):
+    def __init__(self, engine=None):
         pygame.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT)) # スクリーン作成
         pygame.display.set_caption("Rogue-like Python")
         self.clock = pygame.time.Clock() # フレームレートを保つための時計
+        self.text = TextCache() # フォントと描画済みテキストのキャッシュ
         self.running = True # 動作フラグ
+        self.frame_pending = True # 入力を待たずに次のフレームを処理するか (LOOP_MODE = "event" 用)
         
         # ゲーム状態管理
         self.state = "title"  # "title" or "playing"
-        self.game_over = False
         
-        # 画像の読み込みとリサイズ
-        self.images = {}
+        # ゲームの状態とターン処理はエンジンが持つ（ここでは描画と入力だけを扱う）
+        self.engine = engine if engine is not None else GameEngine()
+        self.recorder = None # 行動の記録 (REPLAY_RECORD_DIR が指定されている場合)
+        PROFILER.messages = self.engine.messages # 統計ファイルに書き込めなかったときはメッセージログに出す
+        
+        # 画像の読み込みとリサイズ（1枚のアトラスにまとめ、画面のピクセル形式に変換済み）
         asset_path = os.path.join(os.path.dirname(__file__), "..", "assets")
-        image_files = {
-            "floor": "floor.png",
-            "wall": "wall.png",
-            "downstairs": "downstairs.png",
-            "player": "player.png",
-            "enemy": "enemy.png"
+        self.assets = AssetManager(asset_path, messages=self.engine.messages)
+        self.images = self.assets.load()
+        
+        # Sprite: ゲーム内に登場するオブジェクトのベースになるクラス
+        # Group: スプライトをまとめて管理するコンテナ
+        self.all_sprites = pygame.sprite.Group()
+        self.entity_sprites = {} # エンティティ -> スプライト
+        
+        # マップ描画キャッシュ（画面に映る範囲のタイル層を1枚のSurfaceに事前合成したもの）
+        self.tile_images = {
+            TILE_FLOOR: self.images["floor"],
+            TILE_WALL: self.images["wall"],
+            TILE_STAIRS: self.images["downstairs"],
         }
-        for key, filename in image_files.items():
-            img = pygame.image.load(os.path.join(asset_path, filename))
-            self.images[key] = pygame.transform.scale(img, (TILE_SIZE, TILE_SIZE))
-        
-        # ゲーム変数の初期化（ゲーム開始時に設定）
-        self.floor = None
-        self.dungeon_generator = None
-        self.map_data = None
-        self.all_sprites = None
-        self.enemies = None
-        self.player = None
-        self.enemy_turn_pending = False
+        self.map_surface = None
+        self.map_surface_source = None # map_surface の元になったマップデータ
+        
+        # 視界の暗幕（見えていないタイルを隠す、画面に映る範囲の半透明Surface）
+        self.fog_surface = None
+        self.fog_state = None # fog_surface を描いたときの (視界, 視界の version, カメラ位置 x, y, 視点)
+        
+        # カメラ（画面左上に映るタイル座標）。マップが画面より大きいときはプレイヤーを追ってスクロールする
+        self.camera_x = 0
+        self.camera_y = 0
+        
+        # 差分描画モード (RENDER_MODE = "dirty") 用の状態
+        self.needs_full_redraw = True # 次のフレームで画面全体を描き直すか
+        self.dirty_rects = [] # 次のフレームで描き直す画面上の矩形（スプライトとUI以外）
+        self.prev_sprite_rects = {} # 前フレームで描画したスプライトの画面上の矩形
+        self.prev_ui_state = None # 前フレームで描画したUIの内容 (floor, hp, max_hp, game_over, メッセージ, 計測結果)
     
     def start_game(self):
         """ゲームを開始する（マップ生成とプレイヤー配置）"""
         self.state = "playing"
-        self.floor = 1
-        self.game_over = False
-        
-        # ダンジョン生成
-        self.dungeon_generator = DungeonGenerator()
-        self.map_data = self.dungeon_generator.generate_map(COLS, ROWS)
+        self._finish_recording()
+        self.engine.new_game()
+        if REPLAY_RECORD_DIR is not None:
+            self.recorder = TurnRecorder(self.engine)
+        self.all_sprites.empty()
+        self.entity_sprites = {}
+        self.update()
 
-        # Sprite: ゲーム内に登場するオブジェクトのベースになるクラス
-        # Group: スプライトをまとめて管理するコンテナ
-        self.all_sprites = pygame.sprite.Group()    
-        self.enemies = pygame.sprite.Group()
-        
-        # プレイヤーの初期位置をランダムな床の上に設定
-        valid_positions = []
-        for y, row in enumerate(self.map_data):
-            for x, tile in enumerate(row):
-                if tile == TILE_FLOOR:
-                    valid_positions.append((x, y))
-        
-        if valid_positions:
-            start_pos = random.choice(valid_positions)
-            self.player = Player(start_pos[0], start_pos[1], self.images["player"])
-        else:
-            self.player = Player(1, 1, self.images["player"]) # フォールバック
+    def load_game(self):
+        """セーブデータを読み込んでゲームを再開する（読み込めなければ今の状態のまま）"""
+        try:
+            self.engine.load()
+        except (OSError, ValueError) as e:
+            self.engine.messages.warning(f"Failed to load: {e}")
+            self.needs_full_redraw = True
+            return
+        self._finish_recording() # 読み込んだゲームはシードから再現できないので記録しない
+        self.state = "playing"
+        self.all_sprites.empty()
+        self.entity_sprites = {}
+        self.update()
+
+    def _finish_recording(self):
+        """記録中の行動を書き出して記録を終える"""
+        recorder = self.recorder
+        self.recorder = None
+        if recorder is None or not recorder.actions:
+            return
+        path = os.path.join(REPLAY_RECORD_DIR, f"replay_{recorder.seed}.json")
+        try:
+            os.makedirs(REPLAY_RECORD_DIR, exist_ok=True)
+            recorder.save(path)
+        except OSError as e:
+            self.engine.messages.warning(f"Failed to write replay: {e}")
+
+    def _build_map_surface(self):
+        """画面に映る範囲のタイル層を1枚のSurfaceに事前合成する（マップが変わったときだけ呼ばれる）"""
+        x0, y0, x1, y1 = self._view_tiles()
+        self.map_surface = pygame.Surface(((x1 - x0) * TILE_SIZE, (y1 - y0) * TILE_SIZE)).convert()
+        self._draw_map_tiles(x0, y0, x1, y1)
+
+    def _draw_map_tiles(self, x0, y0, x1, y1):
+        """タイル範囲 (x0, y0, x1, y1) を map_surface のカメラ位置に合わせた場所へ描く"""
+        map_data = self.engine.map_data
+        for y in range(y0, y1):
+            row = map_data[y]
+            screen_y = (y - self.camera_y) * TILE_SIZE
+            for x in range(x0, x1):
+                image = self.tile_images.get(int(row[x]))
+                if image is not None:
+                    self.map_surface.blit(image, ((x - self.camera_x) * TILE_SIZE, screen_y))
 
-        self.all_sprites.add(self.player) # プレイヤーをスプライトグループに追加
+    def _build_fog_surface(self):
+        """画面に映る範囲の暗幕を作る"""
+        x0, y0, x1, y1 = self._view_tiles()
+        size = ((x1 - x0) * TILE_SIZE, (y1 - y0) * TILE_SIZE)
+        if self.fog_surface is None or self.fog_surface.get_size() != size:
+            self.fog_surface = pygame.Surface(size, pygame.SRCALPHA)
+        self._draw_fog_tiles(x0, y0, x1, y1)
+
+    def _draw_fog_tiles(self, x0, y0, x1, y1):
+        """
+        タイル範囲 (x0, y0, x1, y1) の暗幕を fog_surface のカメラ位置に合わせた場所へ描く。
+        見たことのないタイルは黒、見たことはあるが今は見えていないタイルは半透明の黒、見えているタイルは透明にする。
+        """
+        fov = self.engine.fov
+        fog = self.fog_surface
+        left = (x0 - self.camera_x) * TILE_SIZE
+        top = (y0 - self.camera_y) * TILE_SIZE
+        fog.fill((0, 0, 0, 255), (left, top, (x1 - x0) * TILE_SIZE, (y1 - y0) * TILE_SIZE))
         
-        # 階段の配置
-        self._place_stairs()
+        width = fov.width
+        for y in range(y0, y1):
+            start = y * width
+            explored = fov.explored[start + x0:start + x1]
+            if not any(explored):
+                continue # 1マスも見たことのない行はそのまま
+            visible = fov.visible[start + x0:start + x1]
+            screen_y = (y - self.camera_y) * TILE_SIZE
+            for i, seen in enumerate(explored):
+                if seen:
+                    alpha = 0 if visible[i] else FOG_ALPHA
+                    fog.fill((0, 0, 0, alpha), (left + i * TILE_SIZE, screen_y, TILE_SIZE, TILE_SIZE))
+
+    def _update_fog(self):
+        """
+        視界が計算し直されたか、カメラが動いたら暗幕を描き直す。
+        カメラが動かずに視点だけが動いた場合は、前回と今回の視界を囲む範囲だけを描き直して dirty_rects に加える
+        （差分描画モードで1歩ごとに画面全体を描き直さないように）。
+        """
+        fov = self.engine.fov
+        fog_state = (fov, fov.version, self.camera_x, self.camera_y, fov.origin)
+        previous = self.fog_state
+        if fog_state == previous:
+            return
+        self.fog_state = fog_state
         
-        # 敵の生成
-        self._spawn_enemies()
+        if (previous is None or self.fog_surface is None or previous[0] is not fov
+                or previous[2:4] != fog_state[2:4] or previous[4] is None or fov.origin is None):
+            self._build_fog_surface()
+            self.needs_full_redraw = True
+            return
         
-        self.enemy_turn_pending = False
-
-    def _spawn_enemies(self):
-        """各部屋に敵を配置する（プレイヤーのいる部屋を除く）"""
-        player_room_index = -1
-        
-        # プレイヤーがどの部屋にいるか特定
-        px, py = self.player.rect.x // TILE_SIZE, self.player.rect.y // TILE_SIZE
-        for i, room in enumerate(self.dungeon_generator.rooms):
-            rx, ry, rw, rh = room
-            if rx <= px < rx + rw and ry <= py < ry + rh:
-                player_room_index = i
-                break
-        
-        # 部屋ごとに敵を配置
-        for i, room in enumerate(self.dungeon_generator.rooms):
-            if i == player_room_index:
-                continue # プレイヤーのいる部屋には敵を置かない
-            
-            # 一定の確率で敵を配置
-            if random.random() < 0.8:
-                rx, ry, rw, rh = room
-                # 部屋の中のランダムな位置
-                ex = rx + random.randint(0, rw - 1)
-                ey = ry + random.randint(0, rh - 1)
-                
-                enemy = Enemy(ex, ey, self.images["enemy"])
-                self.all_sprites.add(enemy)
-                self.enemies.add(enemy)
+        # 前回と今回の視点を中心に、視界の半径だけ広げた範囲（画面に映っている部分）
+        (old_x, old_y), (new_x, new_y) = previous[4], fov.origin
+        radius = fov.radius
+        view_x0, view_y0, view_x1, view_y1 = self._view_tiles()
+        x0 = max(min(old_x, new_x) - radius, view_x0)
+        y0 = max(min(old_y, new_y) - radius, view_y0)
+        x1 = min(max(old_x, new_x) + radius + 1, view_x1)
+        y1 = min(max(old_y, new_y) + radius + 1, view_y1)
+        if x0 >= x1 or y0 >= y1:
+            return
+        self._draw_fog_tiles(x0, y0, x1, y1)
+        self.dirty_rects.append(pygame.Rect((x0 - self.camera_x) * TILE_SIZE, (y0 - self.camera_y) * TILE_SIZE + UI_HEIGHT,
+                                            (x1 - x0) * TILE_SIZE, (y1 - y0) * TILE_SIZE))
 
-    def _place_stairs(self):
-        """階段をランダムな床タイルに配置する"""
-        valid_positions = []
-        for y, row in enumerate(self.map_data):
-            for x, tile in enumerate(row):
-                if tile == TILE_FLOOR:
-                    valid_positions.append((x, y))
-        
-        if valid_positions:
-            stairs_pos = random.choice(valid_positions)
-            self.map_data[stairs_pos[1]][stairs_pos[0]] = TILE_STAIRS
+    def _update_camera(self):
+        """プレイヤーが画面の中央に来るようにカメラを動かす（マップの端では止める）"""
+        engine = self.engine
+        map_data = engine.map_data
+        height = len(map_data)
+        width = len(map_data[0]) if height > 0 else 0
+        camera_x = min(max(engine.player.x - COLS // 2, 0), max(width - COLS, 0))
+        camera_y = min(max(engine.player.y - ROWS // 2, 0), max(height - ROWS, 0))
+        if (camera_x, camera_y) == (self.camera_x, self.camera_y):
+            return
+        
+        dx = camera_x - self.camera_x
+        dy = camera_y - self.camera_y
+        self.camera_x = camera_x
+        self.camera_y = camera_y
+        self.needs_full_redraw = True
+        if self.map_surface is None:
+            return
+        
+        # キャッシュをずらし、新しく画面に入った列・行だけ描き足す
+        x0, y0, x1, y1 = self._view_tiles()
+        if abs(dx) >= x1 - x0 or abs(dy) >= y1 - y0:
+            self.map_surface = None # 画面全体が入れ替わる場合は作り直す
+            return
+        self.map_surface.scroll(-dx * TILE_SIZE, -dy * TILE_SIZE)
+        if dx > 0:
+            self._draw_map_tiles(x1 - dx, y0, x1, y1)
+        elif dx < 0:
+            self._draw_map_tiles(x0, y0, x0 - dx, y1)
+        if dy > 0:
+            self._draw_map_tiles(x0, y1 - dy, x1, y1)
+        elif dy < 0:
+            self._draw_map_tiles(x0, y0, x1, y0 - dy)
 
     def run(self): # メインループ
         while self.running:
-            if self.state == "title":
-                self.handle_title_events()
+            events = self._next_events()
+            if events is None:
+                continue # 入力も処理待ちもないので何もしない
+            
+            state = self.state
+            if state == "title":
+                self.handle_title_events(events)
                 self.draw_title()
             else:
-                self.handle_events() # イベント処理
-                self.update() # 状態更新
-                self.draw() # 画面描画
-            self.clock.tick(FPS) # フレームレートを維持
+                with PROFILER.span("events"):
+                    self.handle_events(events) # イベント処理
+                with PROFILER.span("update"):
+                    self.update() # 状態更新
+                with PROFILER.span("draw"):
+                    self.draw() # 画面描画
+                if PROFILER.end_frame():
+                    self.frame_pending = True # 計測結果の表示を更新する
+            
+            if self.state != state:
+                self.frame_pending = True # 画面が切り替わったら入力を待たずに描画する
+            if LOOP_MODE != "event":
+                self.clock.tick(FPS) # フレームレートを維持
         
+        self._finish_recording()
+        self.engine.messages.close()
         pygame.quit()
         sys.exit()
+
+    def _next_events(self):
+        """
+        次のフレームで処理するイベントのリストを返す。
+        LOOP_MODE = "event" の場合は入力が来るまで (最大 EVENT_WAIT_TIMEOUT ミリ秒) スリープし、
+        タイムアウトして処理待ちもなければ None を返す。
+        """
+        if LOOP_MODE != "event":
+            return pygame.event.get()
+        
+        if self.frame_pending:
+            self.frame_pending = False
+            return pygame.event.get()
+        
+        event = pygame.event.wait(EVENT_WAIT_TIMEOUT)
+        if event.type == pygame.NOEVENT:
+            return None
+        return [event] + pygame.event.get()
     
-    def handle_title_events(self):
+    def handle_title_events(self, events=None):
         """タイトル画面でのイベント処理"""
-        for event in pygame.event.get():
+        if events is None:
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE or event.key == pygame.K_RETURN:
                     self.start_game()
+                elif event.key == pygame.K_F9:
+                    self.load_game() # セーブデータから再開
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 # スタートボタンのクリック判定
                 mouse_pos = pygame.mouse.get_pos()
@@ -153,8 +295,7 @@ class Game:
         self.screen.fill(BLACK)
         
         # タイトルテキスト
-        title_font = pygame.font.SysFont(None, 72)
-        title_text = title_font.render("ROGUE-LIKE", True, WHITE)
+        title_text = self.text.render("ROGUE-LIKE", 72, WHITE)
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 3))
         self.screen.blit(title_text, title_rect)
         
@@ -164,170 +305,242 @@ class Game:
         button_color = YELLOW if button_rect.collidepoint(mouse_pos) else WHITE
         pygame.draw.rect(self.screen, button_color, button_rect, 3)
         
-        button_font = pygame.font.SysFont(None, 48)
-        button_text = button_font.render("START", True, button_color)
+        button_text = self.text.render("START", 48, button_color)
         button_text_rect = button_text.get_rect(center=button_rect.center)
         self.screen.blit(button_text, button_text_rect)
         
         # 操作説明
-        instruction_font = pygame.font.SysFont(None, 24)
-        instruction_text = instruction_font.render("Press SPACE or ENTER to start", True, WHITE)
+        instruction_text = self.text.render("Press SPACE or ENTER to start (F9 to continue)", 24, WHITE)
         instruction_rect = instruction_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50))
         self.screen.blit(instruction_text, instruction_rect)
         
         pygame.display.flip()
 
-    def handle_events(self):
-        for event in pygame.event.get():
+    def handle_events(self, events=None):
+        if events is None:
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
             elif event.type == pygame.KEYDOWN:
+                # F3: 処理時間の計測と表示の切り替え / F5: セーブ / F9: ロード
+                if event.key == pygame.K_F3:
+                    PROFILER.enabled = not PROFILER.enabled
+                    PROFILER.reset()
+                    self.needs_full_redraw = True
+                    continue
+                if event.key == pygame.K_F5:
+                    try:
+                        self.engine.save()
+                    except OSError as e:
+                        self.engine.messages.warning(f"Failed to save: {e}")
+                        self.needs_full_redraw = True
+                    continue
+                if event.key == pygame.K_F9:
+                    self.load_game()
+                    continue
+                
                 # ゲームオーバー時はRキーでタイトルに戻る
-                if self.game_over:
+                if self.engine.game_over:
                     if event.key == pygame.K_r:
+                        self._finish_recording()
                         self.state = "title"  # タイトル画面に戻る
                     continue
                 
-                dx, dy = 0, 0
-                if event.key == pygame.K_LEFT:
-                    dx = -1
-                elif event.key == pygame.K_RIGHT:
-                    dx = 1
-                elif event.key == pygame.K_UP:
-                    dy = -1
-                elif event.key == pygame.K_DOWN:
-                    dy = 1
-                
-                if dx != 0 or dy != 0:
-                    # まず「移動予定の座標（タイル座標）」を計算
-                    player_tile_x = self.player.rect.x // TILE_SIZE
-                    player_tile_y = self.player.rect.y // TILE_SIZE
-                    target_x = player_tile_x + dx
-                    target_y = player_tile_y + dy
-
-                    # 移動先に敵がいるか確認
-                    target_enemy = None
-                    for enemy in self.enemies:
-                        enemy_tile_x = enemy.rect.x // TILE_SIZE
-                        enemy_tile_y = enemy.rect.y // TILE_SIZE
-                        if enemy_tile_x == target_x and enemy_tile_y == target_y:
-                            target_enemy = enemy
-                            break
-
-                    # 敵がいる場合: 攻撃 / いない場合: 移動
-                    if target_enemy is not None:
-                        print("Player attacks Enemy!")
-                        target_enemy.hp -= self.player.attack_power
-                        print(f"Enemy HP: {target_enemy.hp}")
-                        if target_enemy.hp <= 0:
-                            # kill() で所属している全てのGroupから削除される
-                            target_enemy.kill()
-                            print("Enemy defeated!")
-                        self.enemy_turn_pending = True
+                action = KEY_ACTIONS.get(event.key)
+                if action is not None:
+                    # 攻撃・移動・階段・敵のターンはエンジンが処理する
+                    if self.recorder is not None:
+                        self.recorder.step(action)
                     else:
-                        # 通常移動（移動できたかどうかでターン消費を決める）
-                        before_x, before_y = self.player.rect.x, self.player.rect.y
-                        self.player.move(dx, dy, self.map_data)
-                        moved = (self.player.rect.x != before_x) or (self.player.rect.y != before_y)
-                        if moved:
-                            # 移動先が階段かチェック
-                            player_tile_x = self.player.rect.x // TILE_SIZE
-                            player_tile_y = self.player.rect.y // TILE_SIZE
-                            if self.map_data[player_tile_y][player_tile_x] == TILE_STAIRS:
-                                self.next_level()
-                            else:
-                                self.enemy_turn_pending = True
+                        self.engine.step(action)
 
     def update(self):
-        # NOTE: Enemy.update(map_data) は引数が必要なので、all_sprites.update() は呼ばない
-        # 「キー入力があったときだけ敵も動く」ターン制にしたいので、フラグを使って制御する
-        if self.enemy_turn_pending:
-            player_tile_x = self.player.rect.x // TILE_SIZE
-            player_tile_y = self.player.rect.y // TILE_SIZE
-            self.enemies.update(self.map_data, player_tile_x, player_tile_y)
-            
-            # 敵の移動後、プレイヤーに隣接している敵がいれば攻撃
-            for enemy in self.enemies:
-                enemy_tile_x = enemy.rect.x // TILE_SIZE
-                enemy_tile_y = enemy.rect.y // TILE_SIZE
-                # プレイヤーと隣接しているか判定（上下左右）
-                if abs(enemy_tile_x - player_tile_x) + abs(enemy_tile_y - player_tile_y) == 1:
-                    print("Enemy attacks Player!")
-                    self.player.hp -= enemy.attack_power
-                    print(f"Player HP: {self.player.hp}")
-                    if self.player.hp <= 0:
-                        self.game_over = True
-                        print("Game Over!")
-            
-            self.enemy_turn_pending = False
+        """エンジンの状態をスプライトとマップ描画キャッシュに反映する"""
+        engine = self.engine
+        
+        # 階層が変わった（マップが作り直された）らキャッシュを破棄
+        if engine.map_data is not self.map_surface_source:
+            self.map_surface = None
+            self.map_surface_source = engine.map_data
+            self.needs_full_redraw = True
+        
+        self._update_camera()
+        
+        engine.update_fov()
+        self._update_fog()
+        
+        # スプライトは画面に映っているエンティティの分だけ作る
+        visible = self._visible_entities()
+        for entity in visible:
+            if entity not in self.entity_sprites:
+                image = self.images["player"] if entity is engine.player else self.images["enemy"]
+                sprite = EntitySprite(entity, image)
+                self.entity_sprites[entity] = sprite
+                self.all_sprites.add(sprite)
+        
+        # 画面外に出たエンティティのスプライトは捨てる
+        visible = set(visible)
+        for entity in [entity for entity in self.entity_sprites if entity not in visible]:
+            self.entity_sprites.pop(entity).kill()
+        
+        # スプライトの位置を更新（倒されたエンティティのスプライトはグループから外れる）
+        self.all_sprites.update()
+        for entity in [entity for entity, sprite in self.entity_sprites.items() if not sprite.alive()]:
+            del self.entity_sprites[entity]
+
+    def _view_tiles(self):
+        """画面に映るタイルの範囲 (x0, y0, x1, y1)（x1, y1 は含まない）"""
+        map_data = self.engine.map_data
+        height = len(map_data)
+        width = len(map_data[0]) if height > 0 else 0
+        return self.camera_x, self.camera_y, min(self.camera_x + COLS, width), min(self.camera_y + ROWS, height)
+
+    def _visible_entities(self):
+        """画面に映っていて、プレイヤーの視界に入っているエンティティのリスト"""
+        engine = self.engine
+        x0, y0, x1, y1 = self._view_tiles()
+        if len(engine.enemies) + 1 > (x1 - x0) * (y1 - y0):
+            # 敵が画面のタイル数より多いときは、画面内のタイルを位置の索引で引く
+            get = engine.occupancy.get
+            entities = [entity for y in range(y0, y1) for x in range(x0, x1) if (entity := get(x, y)) is not None]
+        else:
+            entities = [entity for entity in [engine.player] + engine.enemies if x0 <= entity.x < x1 and y0 <= entity.y < y1]
+        # 視界の外にいる敵は描かない
+        fov = engine.fov
+        return [entity for entity in entities if entity is engine.player or fov.is_visible(entity.x, entity.y)]
 
     def draw(self):
+        if RENDER_MODE == "dirty":
+            self._draw_dirty()
+            return
+        
         self.screen.fill(BLACK) # 画面を黒でクリア (これがないと前のフレームの残像が出る)
+        self._draw_scene()
+        pygame.display.flip() # 画面更新
 
+    def _draw_scene(self):
+        """マップ・スプライト・UIをすべて描画する（画面の更新は呼び出し側で行う）"""
         # マップ描画 (UI領域の下にオフセット)
-        for y, row in enumerate(self.map_data):
-            for x, tile in enumerate(row):
-                pos = (x * TILE_SIZE, y * TILE_SIZE + UI_HEIGHT)
-                if tile == TILE_FLOOR:
-                    self.screen.blit(self.images["floor"], pos)
-                elif tile == TILE_WALL:
-                    self.screen.blit(self.images["wall"], pos)
-                elif tile == TILE_STAIRS:
-                    self.screen.blit(self.images["downstairs"], pos)
+        # タイル層は画面に映る範囲をキャッシュしたSurfaceを1回blitするだけ
+        with PROFILER.span("draw.map"):
+            if self.map_surface is None:
+                self._build_map_surface()
+            self.screen.blit(self.map_surface, (0, UI_HEIGHT))
+            self.screen.blit(self.fog_surface, (0, UI_HEIGHT))
 
-        # スプライト描画 (オフセット適用)
-        for sprite in self.all_sprites:
-            offset_rect = sprite.rect.copy()
-            offset_rect.y += UI_HEIGHT
-            self.screen.blit(sprite.image, offset_rect)
+        # スプライト描画 (オフセット適用)。all_sprites には画面に映っているエンティティの分しかない
+        with PROFILER.span("draw.sprites"):
+            for sprite in self.all_sprites:
+                self.screen.blit(sprite.image, self._sprite_screen_rect(sprite))
         
         # UI描画
-        font = pygame.font.SysFont(None, 36)
-        floor_text = font.render(f"Floor: {self.floor}", True, WHITE)
-        hp_text = font.render(f"HP: {self.player.hp}/{self.player.max_hp}", True, WHITE)
-        self.screen.blit(floor_text, (10, 10))
-        self.screen.blit(hp_text, (10, 50))
+        with PROFILER.span("draw.text"):
+            for text, pos in self._ui_texts():
+                self.screen.blit(text, pos)
         
         # ゲームオーバー時の表示
-        if self.game_over:
-            game_over_font = pygame.font.SysFont(None, 72)
-            game_over_text = game_over_font.render("GAME OVER", True, (255, 0, 0))
-            text_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-            self.screen.blit(game_over_text, text_rect)
-            
-            reset_font = pygame.font.SysFont(None, 36)
-            reset_text = reset_font.render("Press R to Restart", True, WHITE)
-            reset_rect = reset_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 60))
-            self.screen.blit(reset_text, reset_rect)
+        if self.engine.game_over:
+            for text, rect in self._game_over_texts():
+                self.screen.blit(text, rect)
+
+    def _sprite_screen_rect(self, sprite):
+        """スプライトの画面上の矩形（カメラの位置を引き、UI領域の分だけ下にずらす）"""
+        return sprite.rect.move(-self.camera_x * TILE_SIZE, UI_HEIGHT - self.camera_y * TILE_SIZE)
+
+    def _ui_texts(self):
+        """UI領域に表示するテキストの (Surface, 位置) のリスト"""
+        player = self.engine.player
+        floor_text = self.text.render(f"Floor: {self.engine.floor}", 36, WHITE)
+        hp_text = self.text.render(f"HP: {player.hp}/{player.max_hp}", 36, WHITE)
+        texts = [(floor_text, (10, 10)), (hp_text, (10, 50))]
         
-        pygame.display.flip() # 画面更新
+        # メッセージログ（新しいものほど下）
+        for i, (level, message) in enumerate(self.engine.messages.recent(MESSAGE_LOG_LINES)):
+            color = RED if level >= WARNING else (160, 160, 160) if level <= DEBUG else WHITE
+            texts.append((self.text.render(message, 20, color), (200, 6 + i * 18)))
+        
+        # 計測中は UI 領域の右側に処理時間を表示する
+        if PROFILER.enabled:
+            for i, line in enumerate(PROFILER.summary_lines(max_spans=3)):
+                text = self.text.render(line, 18, YELLOW)
+                texts.append((text, text.get_rect(topright=(SCREEN_WIDTH - 10, 4 + i * 14))))
+        return texts
+
+    def _game_over_texts(self):
+        """ゲームオーバー表示の (Surface, 矩形) のリスト"""
+        game_over_text = self.text.render("GAME OVER", 72, (255, 0, 0))
+        text_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
+        
+        reset_text = self.text.render("Press R to Restart", 36, WHITE)
+        reset_rect = reset_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 60))
+        return [(game_over_text, text_rect), (reset_text, reset_rect)]
 
-    def next_level(self):
-        """次の階層へ進む。ダンジョンを再生成し、プレイヤーと敵を再配置する。"""
-        self.floor += 1
-        print(f"Advance to level {self.floor}")
-        
-        # ダンジョンを再生成
-        self.map_data = self.dungeon_generator.generate_map(COLS, ROWS)
-        
-        # 既存の敵を全て削除
-        for enemy in self.enemies:
-            enemy.kill()
-        
-        # プレイヤーを再配置
-        valid_positions = []
-        for y, row in enumerate(self.map_data):
-            for x, tile in enumerate(row):
-                if tile == TILE_FLOOR:
-                    valid_positions.append((x, y))
-        
-        if valid_positions:
-            start_pos = random.choice(valid_positions)
-            self.player.rect.x = start_pos[0] * TILE_SIZE
-            self.player.rect.y = start_pos[1] * TILE_SIZE
-        
-        # 階段を再配置
-        self._place_stairs()
-        
-        # 敵を再生成
-        self._spawn_enemies()
\ No newline at end of file
+    def _draw_dirty(self):
+        """
+        前フレームから変化した領域だけを描き直し、pygame.display.update(rects) で転送する。
+        何も変化していなければ描画も転送も行わない。
+        """
+        sprite_rects = {sprite: self._sprite_screen_rect(sprite) for sprite in self.all_sprites}
+        ui_state = (self.engine.floor, self.engine.player.hp, self.engine.player.max_hp, self.engine.game_over,
+                    self.engine.messages.version, tuple(PROFILER.summary_lines(max_spans=3)) if PROFILER.enabled else None)
+        
+        if self.needs_full_redraw:
+            self.screen.fill(BLACK)
+            self._draw_scene()
+            pygame.display.flip()
+            self.needs_full_redraw = False
+            self.dirty_rects = []
+            self.prev_sprite_rects = sprite_rects
+            self.prev_ui_state = ui_state
+            return
+        
+        dirty = self.dirty_rects
+        self.dirty_rects = []
+        
+        # 移動・消滅したスプライトの前回位置と、移動・出現したスプライトの今回位置
+        for sprite, rect in self.prev_sprite_rects.items():
+            if sprite_rects.get(sprite) != rect:
+                dirty.append(rect)
+        for sprite, rect in sprite_rects.items():
+            if self.prev_sprite_rects.get(sprite) != rect:
+                dirty.append(rect)
+        
+        # HPや階層が変わったらUI領域
+        ui_dirty = ui_state != self.prev_ui_state
+        if ui_dirty:
+            dirty.append(pygame.Rect(0, 0, SCREEN_WIDTH, UI_HEIGHT))
+        
+        if not dirty:
+            return # 変化なし：このフレームは何もしない
+        
+        # ゲームオーバー表示と重なる場合は表示全体を描き直す（文字の重ね塗りを防ぐ）
+        game_over_texts = self._game_over_texts() if self.engine.game_over else []
+        for _, rect in game_over_texts:
+            if ui_dirty or rect.collidelist(dirty) != -1:
+                dirty.append(rect)
+        
+        # 背景（UI領域は黒、マップ領域はキャッシュ済みのタイル層）で塗り直す
+        if self.map_surface is None:
+            self._build_map_surface()
+        map_rect = self.map_surface.get_rect(topleft=(0, UI_HEIGHT))
+        for rect in dirty:
+            self.screen.fill(BLACK, rect)
+            area = rect.clip(map_rect)
+            if area.width > 0 and area.height > 0:
+                self.screen.blit(self.map_surface, area.topleft, area.move(0, -UI_HEIGHT))
+                self.screen.blit(self.fog_surface, area.topleft, area.move(0, -UI_HEIGHT))
+        
+        # 塗り直した領域に重なるスプライト・テキストだけを描き直す
+        for sprite, rect in sprite_rects.items():
+            if rect.collidelist(dirty) != -1:
+                self.screen.blit(sprite.image, rect)
+        if ui_dirty:
+            for text, pos in self._ui_texts():
+                self.screen.blit(text, pos)
+        for text, rect in game_over_texts:
+            self.screen.blit(text, rect)
+        
+        pygame.display.update(dirty)
+        self.prev_sprite_rects = sprite_rects
+        self.prev_ui_state = ui_state
@@ -0,0 +1,124 @@
+"""
+マップデータ（タイルの2次元配列）を扱うヘルパー。
+通常は list[list[int]] を使うが、NumPy がインストールされていれば
+uint8 の連続配列 (numpy.ndarray) をマップとして使うこともできる。
+どちらの形式でも map_data[y][x] でタイルを参照できる。
+"""
+from array import array
+from src.settings import TILE_FLOOR, MAP_BACKEND
+
+try:
+    import numpy as np
+except ImportError:  # NumPy はオプション
+    np = None
+
+
+def create_map(width, height, tile, backend=MAP_BACKEND):
+    """
+    すべてのタイルを tile で埋めたマップを作成する。
+    
+    Args:
+        width (int): マップの幅（タイル数）
+        height (int): マップの高さ（タイル数）
+        tile (int): 初期タイル
+        backend (str): "list" または "numpy"
+        
+    Returns:
+        list[list[int]] or numpy.ndarray: マップデータ
+    """
+    if backend == "numpy":
+        if np is None:
+            raise ImportError("MAP_BACKEND = \"numpy\" を使うには NumPy が必要です")
+        return np.full((height, width), tile, dtype=np.uint8)
+    return [[tile] * width for _ in range(height)]
+
+
+def is_array_map(map_data):
+    """マップが NumPy 配列かどうかを返す"""
+    return np is not None and isinstance(map_data, np.ndarray)
+
+
+def fill_rect(map_data, x, y, w, h, tile):
+    """矩形範囲を tile で塗りつぶす（マップ外にはみ出した部分は無視する）"""
+    height = len(map_data)
+    width = len(map_data[0]) if height > 0 else 0
+    x0, x1 = max(0, x), min(width, x + w)
+    y0, y1 = max(0, y), min(height, y + h)
+    if x0 >= x1 or y0 >= y1:
+        return
+    
+    if is_array_map(map_data):
+        map_data[y0:y1, x0:x1] = tile
+    else:
+        fill = [tile] * (x1 - x0)
+        for row in map_data[y0:y1]:
+            row[x0:x1] = fill
+
+
+def create_labels(width, height, backend=MAP_BACKEND):
+    """
+    タイルごとのラベル（連結成分の番号・部屋番号など）を入れる1次元配列を -1 で埋めて作成する。
+    インデックスは y * width + x。1タイル2バイトなので、巨大なマップでもマップ本体と同程度のメモリで済む。
+    
+    Returns:
+        array.array or numpy.ndarray: backend が "numpy" なら int16 の配列、"list" なら array("h")
+    """
+    if backend == "numpy":
+        if np is None:
+            raise ImportError("MAP_BACKEND = \"numpy\" を使うには NumPy が必要です")
+        return np.full(width * height, -1, dtype=np.int16)
+    return array("h", [-1]) * (width * height)
+
+
+def fill_labels(labels, width, rect, label):
+    """create_labels で作ったラベルの矩形範囲 (x, y, w, h) に label を書き込む（矩形はマップ内にあること）"""
+    x, y, w, h = rect
+    if is_array_map(labels):
+        labels.reshape(-1, width)[y:y + h, x:x + w] = label
+        return
+    fill = array("h", [label]) * w
+    for start in range(y * width + x, (y + h) * width + x, width):
+        labels[start:start + w] = fill
+
+
+def tile_positions(map_data, tile=TILE_FLOOR):
+    """
+    指定したタイルの座標をすべて列挙する。
+    
+    Returns:
+        list[tuple]: タイル座標のリスト [(x, y), ...]（行優先の順）
+    """
+    if is_array_map(map_data):
+        ys, xs = np.nonzero(map_data == tile)
+        return list(zip(xs.tolist(), ys.tolist()))
+    return [(x, y) for y, row in enumerate(map_data) for x, t in enumerate(row) if t == tile]
+
+
+def pack_map(map_data):
+    """マップを1タイル1バイトの bytes に変換する（行優先）"""
+    if is_array_map(map_data):
+        return map_data.astype(np.uint8, copy=False).tobytes()
+    return b"".join(bytes(row) for row in map_data)
+
+
+def unpack_map(data, width, height, backend=MAP_BACKEND):
+    """pack_map で作った bytes からマップを復元する"""
+    if backend == "numpy":
+        if np is None:
+            raise ImportError("MAP_BACKEND = \"numpy\" を使うには NumPy が必要です")
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width).copy()
+    return [list(data[y * width:(y + 1) * width]) for y in range(height)]
+
+
+def map_from_buffer(buffer, offset, width, height, backend=MAP_BACKEND):
+    """
+    バッファ（mmap や bytearray）の offset から pack_map 形式のマップを読む。
+    backend が "numpy" の場合はコピーせず、バッファを直接参照する配列を返す
+    （mmap なら実際に参照したページだけがディスクから読み込まれる）。書き込み可能なバッファを渡すこと。
+    """
+    size = width * height
+    if backend == "numpy":
+        if np is None:
+            raise ImportError("MAP_BACKEND = \"numpy\" を使うには NumPy が必要です")
+        return np.frombuffer(buffer, dtype=np.uint8, count=size, offset=offset).reshape(height, width)
+    return unpack_map(buffer[offset:offset + size], width, height, backend)
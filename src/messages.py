@@ -0,0 +1,108 @@
+"""
+ゲーム内のメッセージログ（戦闘・階層の移動など）。
+メッセージは固定長のリングバッファに入れて UI 領域に表示する。標準出力には書かないので、
+敵が大量に攻撃してくるターンでも端末への出力でターン処理が止まることはない。
+ファイルへの書き出しを有効にした場合は、バックグラウンドのスレッドがまとめて書き込む。
+"""
+import queue
+import threading
+from collections import deque
+from src.settings import MESSAGE_LOG_SIZE, MESSAGE_LOG_LEVEL, MESSAGE_LOG_PATH, MESSAGE_FILE_LEVEL
+
+# メッセージのレベル（大きいほど重要。表示・書き出しはレベルでふるい分ける）
+DEBUG = 10
+INFO = 20
+WARNING = 30
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING"}
+
+
+class _FileWriter:
+    """
+    メッセージをキューに溜め、バックグラウンドのスレッドでまとめてファイルに追記する。
+    ファイルは作るときに開く（開けなければ OSError）。
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="message-log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, line):
+        """1行をキューに入れる（ファイルへの書き込みは待たない）"""
+        self._queue.put(line)
+
+    def close(self):
+        """溜まっている分を書き終えてからスレッドを止める"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        with self._file as f:
+            while True:
+                # 1行来るまで待ち、その時点で溜まっている分をまとめて書く
+                lines = [self._queue.get()]
+                while True:
+                    try:
+                        lines.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                closing = None in lines
+                f.writelines(line + "\n" for line in lines if line is not None)
+                f.flush()
+                if closing:
+                    return
+
+
+class MessageLog:
+    """
+    メッセージのリングバッファ。level 未満のメッセージは捨て、file_path が指定されていれば
+    file_level 以上のメッセージをファイルにも書き出す（ファイルを開けなければ警告を出して書き出さない）。
+    """
+    def __init__(self, capacity=MESSAGE_LOG_SIZE, level=MESSAGE_LOG_LEVEL, file_path=MESSAGE_LOG_PATH,
+                 file_level=MESSAGE_FILE_LEVEL):
+        self.messages = deque(maxlen=capacity) # (レベル, 文字列) の新しいものほど後ろ
+        self.level = level
+        self.file_level = file_level
+        self.version = 0 # メッセージが追加されるたびに増える（描画の更新判定用）
+        self._writer = None
+        if file_path is not None:
+            try:
+                self._writer = _FileWriter(file_path)
+            except OSError as e:
+                self.warning(f"Failed to open message log: {e}")
+
+    def log(self, level, text):
+        """メッセージを追加する"""
+        if level >= self.level:
+            self.messages.append((level, text))
+            self.version += 1
+        if self._writer is not None and level >= self.file_level:
+            self._writer.write(f"{LEVEL_NAMES.get(level, level)} {text}")
+
+    def debug(self, text):
+        self.log(DEBUG, text)
+
+    def info(self, text):
+        self.log(INFO, text)
+
+    def warning(self, text):
+        self.log(WARNING, text)
+
+    def recent(self, count):
+        """新しい方から count 件のメッセージを古い順に返す"""
+        if count >= len(self.messages):
+            return list(self.messages)
+        return list(self.messages)[-count:]
+
+    def clear(self):
+        """表示用のメッセージを消す（ファイルに書いた分はそのまま）"""
+        self.messages.clear()
+        self.version += 1
+
+    def close(self):
+        """ファイルへの書き出しを終える（溜まっている分は書き込む）"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -1,19 +1,36 @@
+import copy
 import heapq
-from src.settings import TILE_WALL
+from array import array
+from collections import deque
+from src.settings import TILE_WALL, PATHFINDING_ALGORITHM, PATHFINDING_MAX_NODES, HIERARCHICAL_WINDOW, PATH_CACHE_MAX_REPAIRS
+from src.grid import is_array_map, pack_map
+from src.profiling import PROFILER
 
-def find_path(start, goal, map_data):
+# タイル値 -> 通れないか (bytes.translate 用の変換表。JPS の水平ジャンプで使う)
+BLOCKED_TABLE = bytes(1 if tile == TILE_WALL else 0 for tile in range(256))
+
+def find_path(start, goal, map_data, stats=None, algorithm=PATHFINDING_ALGORITHM,
+              max_nodes=PATHFINDING_MAX_NODES, max_distance=None, region_map=None):
     """
-    A*アルゴリズムを使用してスタートからゴールまでの最短経路を計算する。
+    スタートからゴールまでの最短経路を計算する。
     
     Args:
         start (tuple): スタート地点のタイル座標 (x, y)
         goal (tuple): ゴール地点のタイル座標 (x, y)
-        map_data (list[list[int]]): マップデータ (0: 床, 1: 壁)
+        map_data (list[list[int]] or numpy.ndarray): マップデータ (0: 床, 1: 壁)
+        stats (dict): 渡された場合、展開したノード数を "nodes_expanded" に加算する（ベンチマーク用）
+        algorithm (str): "astar"（A*）または "jps"（Jump Point Search。広い部屋で展開ノードが少ない）
+        max_nodes (int): 展開ノード数の上限。超えたら探索を打ち切って None を返す（None なら無制限）
+        max_distance (int): 経路長の上限。これより長い経路は探さずに None を返す（None なら無制限）
+        region_map (array.array or numpy.ndarray): 連結成分のラベル (DungeonGenerator.region_map。
+            インデックスは y * width + x)。渡された場合、スタートとゴールの成分が違えば探索せずに None を返す
         
     Returns:
         list[tuple] or None: 経路の座標リスト [(x1, y1), (x2, y2), ...]、
                             経路が見つからない場合は None
     """
+    if PROFILER.enabled:
+        PROFILER.count("find_path.calls")
     if start == goal:
         return []
     
@@ -26,6 +43,36 @@ def find_path(start, goal, map_data):
         map_data[goal[1]][goal[0]] == TILE_WALL):
         return None
     
+    # 別の連結成分にあるゴールには到達できない（領域全体を探索し尽くす前に O(1) で判定）
+    if region_map is not None and region_map[start[1] * width + start[0]] != region_map[goal[1] * width + goal[0]]:
+        return None
+    
+    # 直線距離（マンハッタン距離）ですでに上限を超えている場合は探索しない
+    if max_distance is not None and abs(start[0] - goal[0]) + abs(start[1] - goal[1]) > max_distance:
+        return None
+    
+    search = _find_path_jps if algorithm == "jps" else _find_path_astar
+    if PROFILER.enabled:
+        # 計測中は展開ノード数も数える
+        search_stats = {}
+        with PROFILER.span("find_path"):
+            path = search(start, goal, map_data, width, height, search_stats, max_nodes, max_distance)
+        nodes = search_stats.get("nodes_expanded", 0)
+        PROFILER.count("find_path.nodes", nodes)
+        if stats is not None:
+            stats["nodes_expanded"] = stats.get("nodes_expanded", 0) + nodes
+        return path
+    return search(start, goal, map_data, width, height, stats, max_nodes, max_distance)
+
+
+def _count_expanded(stats, closed_set):
+    """展開したノード数を stats に加算する"""
+    if stats is not None:
+        stats["nodes_expanded"] = stats.get("nodes_expanded", 0) + len(closed_set)
+
+
+def _find_path_astar(start, goal, map_data, width, height, stats, max_nodes, max_distance):
+    """A*アルゴリズム（上下左右の4方向）"""
     # ヒューリスティック関数（マンハッタン距離）
     def heuristic(pos):
         return abs(pos[0] - goal[0]) + abs(pos[1] - goal[1])
@@ -58,6 +105,7 @@ def find_path(start, goal, map_data):
                 path.append(current)
                 current = came_from[current]
             path.reverse()
+            _count_expanded(stats, closed_set)
             return path
         
         if current in closed_set:
@@ -65,6 +113,10 @@ def find_path(start, goal, map_data):
         
         closed_set.add(current)
         
+        # 展開ノード数の上限
+        if max_nodes is not None and len(closed_set) > max_nodes:
+            break
+        
         # 隣接ノードを探索
         for dx, dy in directions:
             neighbor = (current[0] + dx, current[1] + dy)
@@ -87,17 +139,169 @@ def find_path(start, goal, map_data):
             
             # より良い経路が見つかった場合
             if neighbor not in g_score or tentative_g < g_score[neighbor]:
+                f_score = tentative_g + heuristic(neighbor)
+                # 経路長の上限を超える枝は捨てる（ヒューリスティックは許容的なので最短経路は失われない）
+                if max_distance is not None and f_score > max_distance:
+                    continue
                 came_from[neighbor] = current
                 g_score[neighbor] = tentative_g
-                f_score = tentative_g + heuristic(neighbor)
                 counter += 1
                 heapq.heappush(open_set, (f_score, counter, neighbor))
     
-    # 経路が見つからない
+    # 経路が見つからない（または上限で打ち切り）
+    _count_expanded(stats, closed_set)
+    return None
+
+
+def _find_path_jps(start, goal, map_data, width, height, stats, max_nodes, max_distance):
+    """
+    Jump Point Search（上下左右の4方向版）。
+    まっすぐ進んでも分岐が生まれないタイルを飛ばし、曲がる必要がある「ジャンプポイント」だけを
+    ヒープに積むので、広い部屋の中でも展開するノードが A* より大幅に少ない。
+    """
+    gx, gy = goal
+    
+    def walkable(x, y):
+        return 0 <= x < width and 0 <= y < height and map_data[y][x] != TILE_WALL
+    
+    # 行ごとの「壁なら1」の bytes（左右の端にマップ外を表す壁を1つずつ足したもの。インデックスは x + 1）。
+    # 垂直移動の1歩ごとに左右の水平ジャンプを調べるので、水平ジャンプは行の bytes の検索だけで済ませ、
+    # 行はこの探索の間だけ覚えておく
+    array_map = is_array_map(map_data)
+    outside_row = b"\x01" * (width + 2)
+    rows = {}
+
+    def blocked_row(y):
+        row = rows.get(y)
+        if row is None:
+            if 0 <= y < height:
+                tiles = map_data[y].tobytes() if array_map else bytes(map_data[y])
+                row = b"\x01" + tiles.translate(BLOCKED_TABLE) + b"\x01"
+            else:
+                row = outside_row
+            rows[y] = row
+        return row
+
+    def jump_horizontal(x, y, dx):
+        """(x, y) から水平方向 dx に進み、最初に見つかったジャンプポイントを返す"""
+        if not (0 <= x < width and 0 <= y < height):
+            return None
+        row = blocked_row(y)
+        i = x + 1
+        if row[i]:
+            return None
+        above = blocked_row(y - 1)
+        below = blocked_row(y + 1)
+        # 止まるのはゴールか、上下に「強制隣接」（背後が壁で横が開いている）があるタイル。
+        # 壁にぶつかるまでに見つからなければジャンプポイントはない
+        if dx > 0:
+            wall = row.find(1, i)
+            stop = wall
+            for side in (above, below):
+                m = side.find(b"\x01\x00", i - 1) # 壁の右隣が床：m + 1 が止まるタイル
+                if m != -1 and m + 1 < stop:
+                    stop = m + 1
+            if y == gy and i <= gx + 1 < stop:
+                stop = gx + 1
+            return (stop - 1, y) if stop < wall else None
+        wall = row.rfind(1, 0, i)
+        stop = wall
+        for side in (above, below):
+            m = side.rfind(b"\x00\x01", 0, i + 2) # 壁の左隣が床：m が止まるタイル
+            if m > stop:
+                stop = m
+        if y == gy and stop < gx + 1 <= i:
+            stop = gx + 1
+        return (stop - 1, y) if stop > wall else None
+
+    def jump(x, y, dx, dy):
+        """(x, y) から (dx, dy) 方向に進み、最初に見つかったジャンプポイントを返す"""
+        if dx != 0:
+            return jump_horizontal(x, y, dx)
+        while walkable(x, y):
+            if x == gx and y == gy:
+                return (x, y)
+            # 垂直移動：左右に強制隣接があれば停止
+            if ((walkable(x - 1, y) and not walkable(x - 1, y - dy)) or
+                    (walkable(x + 1, y) and not walkable(x + 1, y - dy))):
+                return (x, y)
+            # 垂直移動中は、左右への水平ジャンプでジャンプポイントが見つかる地点でも停止
+            if jump_horizontal(x + 1, y, 1) or jump_horizontal(x - 1, y, -1):
+                return (x, y)
+            y += dy
+        return None
+    
+    def heuristic(pos):
+        return abs(pos[0] - gx) + abs(pos[1] - gy)
+    
+    open_set = []
+    counter = 0
+    heapq.heappush(open_set, (heuristic(start), counter, start))
+    g_score = {start: 0}
+    came_from = {}
+    closed_set = set()
+    
+    while open_set:
+        _, _, current = heapq.heappop(open_set)
+        
+        if current == goal:
+            # ジャンプポイント間を直線で補間して、1タイルずつの経路に戻す
+            points = [current]
+            while current in came_from:
+                current = came_from[current]
+                points.append(current)
+            points.reverse()
+            path = []
+            for (x1, y1), (x2, y2) in zip(points, points[1:]):
+                step_x = (x2 > x1) - (x2 < x1)
+                step_y = (y2 > y1) - (y2 < y1)
+                x, y = x1, y1
+                while (x, y) != (x2, y2):
+                    x += step_x
+                    y += step_y
+                    path.append((x, y))
+            _count_expanded(stats, closed_set)
+            return path
+        
+        if current in closed_set:
+            continue
+        closed_set.add(current)
+        
+        if max_nodes is not None and len(closed_set) > max_nodes:
+            break
+        
+        # 進んできた方向から、調べる必要のある方向だけに絞る（枝刈り）
+        cx, cy = current
+        parent = came_from.get(current)
+        if parent is None:
+            directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        else:
+            dx = (cx > parent[0]) - (cx < parent[0])
+            dy = (cy > parent[1]) - (cy < parent[1])
+            if dx != 0:
+                directions = [(0, -1), (0, 1), (dx, 0)]
+            else:
+                directions = [(-1, 0), (1, 0), (0, dy)]
+        
+        for dx, dy in directions:
+            point = jump(cx + dx, cy + dy, dx, dy)
+            if point is None or point in closed_set:
+                continue
+            tentative_g = g_score[current] + abs(point[0] - cx) + abs(point[1] - cy)
+            if point not in g_score or tentative_g < g_score[point]:
+                f_score = tentative_g + heuristic(point)
+                if max_distance is not None and f_score > max_distance:
+                    continue
+                came_from[point] = current
+                g_score[point] = tentative_g
+                counter += 1
+                heapq.heappush(open_set, (f_score, counter, point))
+    
+    _count_expanded(stats, closed_set)
     return None
 
 
-def get_next_step(start, goal, map_data):
+def get_next_step(start, goal, map_data, max_distance=None, region_map=None, algorithm=PATHFINDING_ALGORITHM):
     """
     find_path を使用して、次の1歩だけを返す便利関数。
     
@@ -105,11 +309,433 @@ def get_next_step(start, goal, map_data):
         start (tuple): スタート地点のタイル座標 (x, y)
         goal (tuple): ゴール地点のタイル座標 (x, y)
         map_data (list[list[int]]): マップデータ
+        max_distance (int): 経路長の上限（None なら無制限）
+        region_map (array.array or numpy.ndarray): 連結成分のラベル（到達できないゴールを即座に除外する）
+        algorithm (str): find_path の探索エンジン ("astar" / "jps")
         
     Returns:
         tuple or None: 次に移動すべき座標 (x, y)、経路がない場合は None
     """
-    path = find_path(start, goal, map_data)
+    path = find_path(start, goal, map_data, algorithm=algorithm, max_distance=max_distance, region_map=region_map)
     if path and len(path) > 0:
         return path[0]
     return None
+
+
+class PathCache:
+    """
+    1体分の経路キャッシュ。同じ相手を追い続ける間は前回の経路の残りを使い回し、探索しない。
+    - 自分が経路どおりに1歩進んだ：先頭を取り除くだけ
+    - ゴールが1タイル動いた：経路の末尾を付け足す／切り詰めるだけで修復する（max_repairs 回まで）
+    - 経路から外れた、ゴールが大きく動いた、マップが変わった：探索し直す
+    """
+    __slots__ = ("max_repairs", "map_data", "origin", "goal", "path", "repairs")
+
+    def __init__(self, max_repairs=PATH_CACHE_MAX_REPAIRS):
+        self.max_repairs = max_repairs # 探索し直さずに修復する回数の上限（経路が遠回りになりすぎないように）
+        self.invalidate()
+
+    def invalidate(self):
+        """キャッシュを捨てる"""
+        self.map_data = None # 経路を計算したマップ（参照を持つので別のマップと取り違えない）
+        self.origin = None # 経路の出発点（経路自体には含まない）
+        self.goal = None
+        self.path = None # origin の次のタイルから goal までの経路 (deque)。None なら到達不能
+        self.repairs = 0
+
+    def get_next_step(self, start, goal, map_data, max_distance=None, region_map=None):
+        """
+        次の1歩を返す（get_next_step と同じ使い方）。
+        
+        Args:
+            start (tuple): スタート地点のタイル座標 (x, y)
+            goal (tuple): ゴール地点のタイル座標 (x, y)
+            map_data (list[list[int]]): マップデータ
+            max_distance (int): 経路長の上限（None なら無制限）
+            region_map (array.array or numpy.ndarray): 連結成分のラベル
+            
+        Returns:
+            tuple or None: 次に移動すべき座標 (x, y)、経路がない場合は None
+        """
+        hit = self._update(start, goal, map_data, max_distance)
+        if PROFILER.enabled:
+            PROFILER.count("path_cache.hits" if hit else "path_cache.misses")
+        if not hit:
+            path = find_path(start, goal, map_data, max_distance=max_distance, region_map=region_map)
+            self.map_data = map_data
+            self.origin = start
+            self.goal = goal
+            self.path = deque(path) if path is not None else None
+            self.repairs = 0
+        
+        if self.path:
+            return self.path[0]
+        return None
+
+    def _update(self, start, goal, map_data, max_distance):
+        """キャッシュを今回の start / goal に合わせる。使えなければ False を返す"""
+        if map_data is not self.map_data:
+            return False
+        
+        path = self.path
+        if start != self.origin:
+            # 前回の1歩目に進んでいれば、その分だけ経路を進める
+            if not path or start != path[0]:
+                return False
+            path.popleft()
+            self.origin = start
+        
+        if goal == self.goal:
+            return True
+        if path is None or self.repairs >= self.max_repairs:
+            return False
+        if abs(goal[0] - self.goal[0]) + abs(goal[1] - self.goal[1]) != 1:
+            return False
+        
+        # ゴールが隣のタイルに動いた：戻ってきたなら末尾を切り詰め、そうでなければ付け足す
+        if len(path) >= 2 and path[-2] == goal:
+            path.pop()
+        elif goal == self.origin:
+            return False
+        else:
+            path.append(goal)
+            if max_distance is not None and len(path) > max_distance:
+                return False
+        self.goal = goal
+        self.repairs += 1
+        return True
+
+
+class DistanceMap:
+    """
+    距離マップ（ゴールから各タイルまでの歩数）。1階層につき1つ作り、ターンごとに compute() で計算し直して全ての敵で共有する。
+    歩数はマップと同じ大きさの1次元配列（インデックスは y * width + x）に持ち、計算し直すときは
+    前回たどり着いたタイルだけを -1 に戻すので、ターンごとの確保もマップ全体の初期化もない。
+    """
+    def __init__(self, map_data):
+        self.height = len(map_data)
+        self.width = len(map_data[0]) if self.height > 0 else 0
+        self.blocked = pack_map(map_data).translate(BLOCKED_TABLE) # 壁なら1（マップは階層の間変わらない）
+        self.distances = array("i", [-1]) * (self.width * self.height) # 到達できないタイルは -1
+        self._reached = [] # 前回の計算でたどり着いたタイルのインデックス（幅優先探索の順）
+
+    def compute(self, goal, max_distance=None):
+        """
+        幅優先探索でゴールから各タイルまでの歩数を計算し直す。
+        
+        Args:
+            goal (tuple): ゴール地点のタイル座標 (x, y)
+            max_distance (int): この歩数より先は探索しない（None なら無制限）
+        """
+        distances = self.distances
+        for index in self._reached:
+            distances[index] = -1
+        self._reached = []
+        
+        width, height = self.width, self.height
+        gx, gy = goal
+        goal_index = gy * width + gx
+        if not (0 <= gx < width and 0 <= gy < height) or self.blocked[goal_index]:
+            return
+        
+        blocked = self.blocked
+        size = width * height
+        distances[goal_index] = 0
+        reached = [goal_index] # 幅優先探索のキューを兼ねる
+        self._reached = reached
+        head = 0
+        while head < len(reached):
+            index = reached[head]
+            head += 1
+            next_distance = distances[index] + 1
+            if max_distance is not None and next_distance > max_distance:
+                break # 幅優先なので、残りのタイルもすべて上限を超える
+            # 上下左右（ループにせず展開しておく。マップ全体を探索する場合はここが一番重い）
+            x = index % width
+            if x > 0:
+                neighbor = index - 1
+                if distances[neighbor] == -1 and not blocked[neighbor]:
+                    distances[neighbor] = next_distance
+                    reached.append(neighbor)
+            if x < width - 1:
+                neighbor = index + 1
+                if distances[neighbor] == -1 and not blocked[neighbor]:
+                    distances[neighbor] = next_distance
+                    reached.append(neighbor)
+            if index >= width:
+                neighbor = index - width
+                if distances[neighbor] == -1 and not blocked[neighbor]:
+                    distances[neighbor] = next_distance
+                    reached.append(neighbor)
+            neighbor = index + width
+            if neighbor < size and distances[neighbor] == -1 and not blocked[neighbor]:
+                distances[neighbor] = next_distance
+                reached.append(neighbor)
+
+    def get(self, x, y):
+        """タイルからゴールまでの歩数（到達できない・マップ外なら -1）"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.distances[y * self.width + x]
+        return -1
+
+
+def compute_distance_map(goal, map_data, max_distance=None):
+    """
+    幅優先探索でゴールから各タイルまでの歩数を計算する（距離マップ）。
+    毎ターン計算する場合は DistanceMap を階層ごとに1つ作って使い回すこと（ここでは毎回作る）。
+    
+    Args:
+        goal (tuple): ゴール地点のタイル座標 (x, y)
+        map_data (list[list[int]] or numpy.ndarray): マップデータ
+        max_distance (int): この歩数より先は探索しない（None なら無制限）
+        
+    Returns:
+        DistanceMap: 計算済みの距離マップ
+    """
+    distance_map = DistanceMap(map_data)
+    distance_map.compute(goal, max_distance)
+    return distance_map
+
+
+def get_next_step_from_distance_map(start, distance_map):
+    """
+    距離マップを参照して、ゴールに1歩近づく隣接タイルを返す（O(1)）。
+    
+    Args:
+        start (tuple): スタート地点のタイル座標 (x, y)
+        distance_map (DistanceMap): 計算済みの距離マップ
+        
+    Returns:
+        tuple or None: 次に移動すべき座標 (x, y)、経路がない場合は None
+    """
+    x, y = start
+    current = distance_map.get(x, y)
+    if current <= 0:
+        return None  # 到達不能、またはすでにゴール上
+    
+    for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+        nx, ny = x + dx, y + dy
+        if distance_map.get(nx, ny) == current - 1:
+            return (nx, ny)
+    return None
+
+
+class HierarchicalPathfinder:
+    """
+    部屋と通路のグラフを使う階層的経路探索（HPA*風）。
+    まず「部屋」「通路のひとつながり」を1ノードとする粗いグラフでどこを通るかを決め、
+    タイル単位の探索は今いるエリアから数個先のエリアまでの範囲だけで行う。
+    マップが広くなっても1回の探索コストがほぼ一定になる。
+    1階層につき1つ作り、粗いグラフとタイル -> エリアの対応はその階層の間使い回す。
+    """
+    def __init__(self, dungeon_generator, window=HIERARCHICAL_WINDOW):
+        self.map_data = dungeon_generator.map_data
+        self.region_map = dungeon_generator.region_map
+        self.window = window # タイル単位で探索するエリアの数（今いるエリアを含む、最低2）
+        
+        height = len(self.map_data)
+        width = len(self.map_data[0]) if height > 0 else 0
+        self.width = width
+        self.height = height
+        
+        # エリア: 部屋 (0..部屋数-1) と、部屋の外の通路タイルのひとつながり (部屋数..)
+        # タイル -> エリア番号（部屋が重なる場合は先の部屋を優先）。部屋番号のラベルをコピーして通路を書き足す
+        self.area_map = copy.copy(dungeon_generator.room_map)
+        self.area_bounds = [] # エリアごとの外接矩形 (x0, y0, x1, y1)（両端を含む）
+        self.area_graph = [] # エリアごとの隣接エリアの集合
+        for room in dungeon_generator.rooms:
+            x0, y0 = max(0, room[0]), max(0, room[1])
+            x1, y1 = min(width, room[0] + room[2]) - 1, min(height, room[1] + room[3]) - 1
+            self.area_bounds.append((x0, y0, x1, y1))
+            self.area_graph.append(set())
+        
+        # 部屋同士の隣接：部屋の外周のすぐ外側だけを調べる
+        for i, (x0, y0, x1, y1) in enumerate(self.area_bounds):
+            if x0 > x1 or y0 > y1:
+                continue
+            for x, y in self._outer_border(x0, y0, x1, y1):
+                other = int(self.area_map[y * width + x])
+                if other != -1 and other != i:
+                    self.area_graph[i].add(other)
+                    self.area_graph[other].add(i)
+        
+        # 通路：部屋の外の床タイルを塗りつぶしてひとつながりごとにエリアにする（通路は細いので安い）
+        for cx, cy, cw, ch in dungeon_generator.corridors:
+            for y in range(cy, cy + ch):
+                for x in range(cx, cx + cw):
+                    if self.area_map[y * width + x] == -1 and self.map_data[y][x] != TILE_WALL:
+                        self._flood_corridor(x, y)
+        
+        # エリアの中心（粗いグラフのコスト計算用）
+        self.centers = [((x0 + x1) // 2, (y0 + y1) // 2) for x0, y0, x1, y1 in self.area_bounds]
+
+    def _outer_border(self, x0, y0, x1, y1):
+        """矩形のすぐ外側を囲むタイル（マップ内のもの、角は除く）"""
+        tiles = []
+        for x in range(x0, x1 + 1):
+            tiles.append((x, y0 - 1))
+            tiles.append((x, y1 + 1))
+        for y in range(y0, y1 + 1):
+            tiles.append((x0 - 1, y))
+            tiles.append((x1 + 1, y))
+        return [(x, y) for x, y in tiles if 0 <= x < self.width and 0 <= y < self.height]
+
+    def _flood_corridor(self, x, y):
+        """(x, y) から部屋の外の床タイルを塗りつぶし、1つの通路エリアとして登録する"""
+        area = len(self.area_bounds)
+        neighbors = set()
+        area_map = self.area_map
+        width = self.width
+        area_map[y * width + x] = area
+        stack = [(x, y)]
+        x0, y0, x1, y1 = x, y, x, y
+        while stack:
+            cx, cy = stack.pop()
+            x0, y0, x1, y1 = min(x0, cx), min(y0, cy), max(x1, cx), max(y1, cy)
+            for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+                nx, ny = cx + dx, cy + dy
+                if not (0 <= nx < width and 0 <= ny < self.height):
+                    continue
+                other = area_map[ny * width + nx]
+                if other == -1:
+                    if self.map_data[ny][nx] != TILE_WALL:
+                        area_map[ny * width + nx] = area
+                        stack.append((nx, ny))
+                elif other != area:
+                    neighbors.add(int(other)) # 接している部屋
+        self.area_bounds.append((x0, y0, x1, y1))
+        self.area_graph.append(neighbors)
+        for other in neighbors:
+            self.area_graph[other].add(area)
+
+    def find_area_path(self, start_area, goal_area):
+        """エリアのグラフ上の A*。通るエリア番号のリスト（start_area を含む）を返す"""
+        if start_area == goal_area:
+            return [start_area]
+        
+        centers = self.centers
+        gx, gy = centers[goal_area]
+        open_set = [(0, 0, start_area)]
+        g_score = {start_area: 0}
+        came_from = {}
+        closed_set = set()
+        counter = 0
+        while open_set:
+            _, _, current = heapq.heappop(open_set)
+            if current == goal_area:
+                path = [current]
+                while current in came_from:
+                    current = came_from[current]
+                    path.append(current)
+                path.reverse()
+                return path
+            if current in closed_set:
+                continue
+            closed_set.add(current)
+            cx, cy = centers[current]
+            for neighbor in self.area_graph[current]:
+                if neighbor in closed_set:
+                    continue
+                nx, ny = centers[neighbor]
+                tentative_g = g_score[current] + abs(nx - cx) + abs(ny - cy)
+                if neighbor not in g_score or tentative_g < g_score[neighbor]:
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    counter += 1
+                    heapq.heappush(open_set, (tentative_g + abs(nx - gx) + abs(ny - gy), counter, neighbor))
+        return None
+
+    def get_next_step(self, start, goal, max_distance=None):
+        """
+        次の1歩を返す（get_next_step と同じ使い方）。
+        
+        Args:
+            start (tuple): スタート地点のタイル座標 (x, y)
+            goal (tuple): ゴール地点のタイル座標 (x, y)
+            max_distance (int): マンハッタン距離がこれより遠いゴールは追わない（None なら無制限）
+            
+        Returns:
+            tuple or None: 次に移動すべき座標 (x, y)、経路がない場合は None
+        """
+        if start == goal:
+            return None
+        sx, sy = start
+        gx, gy = goal
+        if max_distance is not None and abs(sx - gx) + abs(sy - gy) > max_distance:
+            return None
+        width = self.width
+        label = self.region_map[sy * width + sx]
+        if label == -1 or label != self.region_map[gy * width + gx]:
+            return None # 到達できない
+        
+        start_area = int(self.area_map[sy * width + sx])
+        goal_area = int(self.area_map[gy * width + gx])
+        area_path = self.find_area_path(start_area, goal_area)
+        if area_path is None:
+            return None
+        
+        # タイル単位の探索は先頭から window 個のエリアの中だけで行う
+        window_path = area_path[:max(2, self.window)]
+        allowed = set(window_path)
+        if goal_area in allowed:
+            target_area = None # ゴールそのものを目指す
+        else:
+            target_area = window_path[-1] # 探索範囲の最後のエリアに入れば十分
+        path = self._find_local_path(start, goal, allowed, target_area)
+        if path is None:
+            # 重なった部屋が分断されている場合など、範囲内で見つからなければ通常の探索に任せる
+            return get_next_step(start, goal, self.map_data, region_map=self.region_map)
+        if path:
+            return path[0]
+        return None
+
+    def _find_local_path(self, start, goal, allowed, target_area):
+        """allowed に含まれるエリアのタイルだけを通る A*。target_area があればそのエリアに入った時点で終了する"""
+        if target_area is None:
+            tx0, ty0, tx1, ty1 = goal[0], goal[1], goal[0], goal[1]
+        else:
+            tx0, ty0, tx1, ty1 = self.area_bounds[target_area]
+        
+        # ヒューリスティック：目標（エリアの外接矩形）までのマンハッタン距離
+        def heuristic(pos):
+            x, y = pos
+            dx = tx0 - x if x < tx0 else (x - tx1 if x > tx1 else 0)
+            dy = ty0 - y if y < ty0 else (y - ty1 if y > ty1 else 0)
+            return dx + dy
+        
+        area_map = self.area_map
+        map_data = self.map_data
+        width, height = self.width, self.height
+        open_set = [(heuristic(start), 0, start)]
+        g_score = {start: 0}
+        came_from = {}
+        closed_set = set()
+        counter = 0
+        while open_set:
+            _, _, current = heapq.heappop(open_set)
+            if current == goal or (target_area is not None and area_map[current[1] * width + current[0]] == target_area):
+                path = []
+                while current in came_from:
+                    path.append(current)
+                    current = came_from[current]
+                path.reverse()
+                return path
+            if current in closed_set:
+                continue
+            closed_set.add(current)
+            for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+                nx, ny = current[0] + dx, current[1] + dy
+                if not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                if area_map[ny * width + nx] not in allowed or map_data[ny][nx] == TILE_WALL:
+                    continue
+                neighbor = (nx, ny)
+                if neighbor in closed_set:
+                    continue
+                tentative_g = g_score[current] + 1
+                if neighbor not in g_score or tentative_g < g_score[neighbor]:
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    counter += 1
+                    heapq.heappush(open_set, (tentative_g + heuristic(neighbor), counter, neighbor))
+        return None
@@ -0,0 +1,143 @@
+"""
+処理時間の計測（プロファイリング）。
+名前付きの区間 (span) の処理時間と、find_path の呼び出し回数などのカウンタを集計し、
+PROFILE_WINDOW 秒ごとに確定して画面のデバッグ表示と統計ファイルに出す。
+無効なときの span() は何もしないコンテキストマネージャを返すだけなので、ほぼコストがかからない。
+"""
+import json
+import time
+from contextlib import nullcontext
+from src.settings import PROFILE_ENABLED, PROFILE_WINDOW, PROFILE_DUMP_PATH
+
+# 無効なときに span() が返す何もしないコンテキストマネージャ（毎回作らずに使い回す）
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    """1回分の区間の計測"""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.add_time(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class Profiler:
+    """
+    区間の処理時間とカウンタの集計。
+        with PROFILER.span("draw"):
+            ...
+        PROFILER.count("find_path.calls")
+    フレームの終わりに end_frame() を呼ぶと、window 秒ごとに集計を確定する（last_spans / last_counters）。
+    先読みスレッドの階層生成も同じ集計に入る（ロックはしないので、同時に記録された分がまれに欠けることがある）。
+    """
+    def __init__(self, enabled=PROFILE_ENABLED, window=PROFILE_WINDOW, dump_path=PROFILE_DUMP_PATH):
+        self.enabled = enabled
+        self.window = window # 集計を確定する間隔（秒）
+        self.dump_path = dump_path # 確定した集計を1行1JSONで追記するファイル（None なら書き出さない）
+        self.messages = None # 統計ファイルに書き込めなかったことを知らせるメッセージログ（None なら知らせない）
+        self.reset()
+
+    def reset(self):
+        """集計をすべて捨てる"""
+        self.spans = {} # 名前 -> [回数, 合計ミリ秒, 最大ミリ秒]（集計中）
+        self.counters = {} # 名前 -> 値（集計中）
+        self.frames = 0
+        self.window_start = time.perf_counter()
+        self.last_spans = {} # 直前に確定した集計
+        self.last_counters = {}
+        self.last_frames = 0
+
+    def span(self, name):
+        """名前付きの区間の処理時間を計測するコンテキストマネージャを返す"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def add_time(self, name, ms):
+        """区間の処理時間を加算する"""
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [1, ms, ms]
+        else:
+            span[0] += 1
+            span[1] += ms
+            if ms > span[2]:
+                span[2] = ms
+
+    def count(self, name, value=1):
+        """カウンタを加算する"""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def end_frame(self):
+        """
+        1フレームの終わりに呼ぶ。前回の確定から window 秒たっていれば集計を確定する。
+
+        Returns:
+            bool: 集計を確定したかどうか（デバッグ表示の更新判定用）
+        """
+        if not self.enabled:
+            return False
+        self.frames += 1
+        now = time.perf_counter()
+        if now - self.window_start < self.window:
+            return False
+
+        self.last_spans = self.spans
+        self.last_counters = self.counters
+        self.last_frames = self.frames
+        if self.dump_path is not None:
+            self._dump(now - self.window_start)
+        self.spans = {}
+        self.counters = {}
+        self.frames = 0
+        self.window_start = now
+        return True
+
+    def summary_lines(self, max_spans=4):
+        """
+        直前に確定した集計をデバッグ表示用の文字列にする。
+        処理時間の合計が大きい区間から max_spans 個（1フレームあたりの平均）と、カウンタを1行にまとめたもの。
+        """
+        frames = max(self.last_frames, 1)
+        lines = [f"{frames} frames"]
+        spans = sorted(self.last_spans.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (calls, total, longest) in spans[:max_spans]:
+            lines.append(f"{name}: {total / frames:.2f}ms/f x{calls} max {longest:.2f}ms")
+        if self.last_counters:
+            lines.append(" ".join(f"{name}={value}" for name, value in sorted(self.last_counters.items())))
+        return lines
+
+    def _dump(self, elapsed):
+        """
+        確定した集計を統計ファイルに1行追記する。
+        書き込めなかった場合はメッセージログに出して以後の書き出しをやめる（ゲームは続ける）。
+        """
+        record = {
+            "time": time.time(),
+            "seconds": elapsed,
+            "frames": self.frames,
+            "spans": {name: {"calls": calls, "total_ms": total, "max_ms": longest}
+                      for name, (calls, total, longest) in self.spans.items()},
+            "counters": self.counters,
+        }
+        try:
+            with open(self.dump_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, sort_keys=True) + "\n")
+        except OSError as e:
+            self.dump_path = None
+            if self.messages is not None:
+                self.messages.warning(f"Failed to write profile: {e}")
+
+
+# ゲーム全体で共有するプロファイラ（find_path など、呼び出し元から渡しにくい場所でも使う）
+PROFILER = Profiler()
@@ -0,0 +1,140 @@
+"""
+ターンの記録と再生。
+1ゲーム分の乱数シードと、ターンを消費したプレイヤーの行動の列を記録する。
+GameEngine はダンジョン・敵の配置・敵の行動がすべてシードから決まるので、
+同じシードで同じ行動を同じ順に与えれば、キーボードもFPSの待ちもなしに同じゲームを再現できる。
+遅かったプレイを記録しておき、敵のAIや階層の切り替えのプロファイルに繰り返し使う。
+"""
+import hashlib
+import json
+import time
+from src import settings
+from src.grid import pack_map
+
+# 記録の形式を変えたら上げる
+REPLAY_VERSION = 1
+
+# 再生結果に影響する設定（記録に残し、再生時に今の設定と違うものを知らせる）
+RESULT_SETTINGS = (
+    "ENEMY_PATHFINDING",
+    "ENEMY_PHASE",
+    "PATHFINDING_ALGORITHM",
+    "ENEMY_PATH_CACHE",
+    "PATH_CACHE_MAX_REPAIRS",
+    "ENEMY_PATH_MAX_DISTANCE",
+    "HIERARCHICAL_WINDOW",
+    "FOV_RADIUS",
+    "MAP_BACKEND",
+)
+
+
+def state_digest(engine):
+    """ゲームの状態（階層・マップ・プレイヤー・敵）のハッシュ。再生結果が記録と一致するかの確認に使う"""
+    digest = hashlib.md5()
+    player = engine.player
+    digest.update(repr((engine.floor, engine.game_over, player.x, player.y, player.hp)).encode())
+    digest.update(repr([(enemy.x, enemy.y, enemy.hp) for enemy in engine.enemies]).encode())
+    digest.update(pack_map(engine.map_data))
+    return digest.hexdigest()
+
+
+class TurnRecorder:
+    """
+    GameEngine.step の代わりに step() を呼ぶと、ターンを消費した行動と処理時間を記録する。
+    記録は new_game() の直後から始めること（シードはエンジンから取る）。
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.seed = engine.seed
+        self.actions = [] # ターンを消費した行動 (dx, dy)
+        self.turn_ms = [] # ターンごとの engine.step の処理時間（ミリ秒）
+        self.floors = [] # ターンごとの、行動後の階層
+
+    def step(self, action):
+        """engine.step(action) を呼び、ターンを消費していれば記録する"""
+        start_time = time.perf_counter()
+        consumed = self.engine.step(action)
+        elapsed = (time.perf_counter() - start_time) * 1000
+        if consumed:
+            self.actions.append(action)
+            self.turn_ms.append(elapsed)
+            self.floors.append(self.engine.floor)
+        return consumed
+
+    def to_dict(self):
+        """記録を JSON にできる辞書にする"""
+        engine = self.engine
+        return {
+            "version": REPLAY_VERSION,
+            "seed": self.seed,
+            "width": engine.width,
+            "height": engine.height,
+            # 結果に影響する設定（再生時に違っていれば結果も変わる）
+            "settings": current_settings(),
+            "actions": [list(action) for action in self.actions],
+            "turn_ms": self.turn_ms,
+            "floors": self.floors,
+            "final_state": state_digest(engine),
+        }
+
+    def save(self, path):
+        """記録を JSON ファイルに書き出す"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+
+def current_settings():
+    """RESULT_SETTINGS の今の値を 名前 -> 値 の辞書で返す"""
+    return {name: getattr(settings, name) for name in RESULT_SETTINGS}
+
+
+def settings_diff(data):
+    """
+    記録したときと今とで値が違う設定を (名前, 記録の値, 今の値) のリストで返す。
+    記録に残っていない設定（古い記録など）は比べない。
+    """
+    recorded = data.get("settings", {})
+    current = current_settings()
+    return [(name, recorded[name], current[name]) for name in RESULT_SETTINGS
+            if name in recorded and recorded[name] != current[name]]
+
+
+def load_replay(path):
+    """
+    TurnRecorder.save で書き出した記録を読み込む。
+
+    Raises:
+        ValueError: 記録のバージョンが違う場合
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != REPLAY_VERSION:
+        raise ValueError(f"記録のバージョン {data.get('version')} には対応していません（対応: {REPLAY_VERSION}）")
+    data["actions"] = [tuple(action) for action in data["actions"]]
+    return data
+
+
+def replay(data, engine, on_turn=None):
+    """
+    記録した行動をエンジンに与えてゲームを再現する（待ちは入れず、最大速度で進める）。
+
+    Args:
+        data (dict): load_replay の結果
+        engine (GameEngine): 再生に使うエンジン（new_game は data のシードでここで呼ぶ）
+        on_turn (callable): ターンごとに呼ぶ関数 on_turn(turn, action)（描画など。計測時間には含めない）
+
+    Returns:
+        list[float]: ターンごとの engine.step の処理時間（ミリ秒）
+    """
+    engine.new_game(data["seed"])
+    if on_turn is not None:
+        on_turn(-1, None)
+
+    turn_ms = []
+    for turn, action in enumerate(data["actions"]):
+        start_time = time.perf_counter()
+        engine.step(action)
+        turn_ms.append((time.perf_counter() - start_time) * 1000)
+        if on_turn is not None:
+            on_turn(turn, action)
+    return turn_ms
@@ -0,0 +1,183 @@
+"""
+ゲームの状態のセーブデータ（バイナリ形式）の読み書き。
+
+ファイルの構成（リトルエンディアン）:
+    FILE_HEADER      マジック・バージョン・現在の階層・ゲームオーバーか・保存した階層の数・ゲームの乱数シード
+    PLAYER_RECORD    プレイヤー
+    階層ごとに       FLOOR_HEADER, 部屋 RECT_RECORD * n, 通路 RECT_RECORD * n, 敵 ENEMY_RECORD * n
+    層               階層ごとのタイル（grid.pack_map 形式、1タイル1バイト）と探索済みフラグ（同じく1バイト）
+メタデータの後ろに層をまとめて置き、FLOOR_HEADER にはファイル先頭からのオフセットだけを書く。
+読み込み時は mmap でファイルを開くので、巨大なマップでも層はコピーせず、参照したページだけが読み込まれる。
+"""
+import mmap
+import os
+import struct
+from src.settings import MAP_BACKEND, SAVE_MMAP
+from src.dungeon import DungeonGenerator
+from src.entities import Player, Enemy
+from src.fov import FieldOfView
+from src.grid import pack_map, map_from_buffer
+
+SAVE_MAGIC = b"RLPS"
+# 形式を変えたら上げる（古いバージョンのファイルは読み込まない）
+SAVE_VERSION = 2
+
+# magic, version, (予約), 現在の階層, ゲームオーバーか, 階層の数, ゲームの乱数シード
+FILE_HEADER = struct.Struct("<4sHHIB3xIQ")
+# x, y, hp, max_hp, attack_power
+PLAYER_RECORD = struct.Struct("<iiiii")
+# x, y, hp, max_hp, attack_power, sight_range, act_chance, path_max_distance (-1 なら無制限)
+ENEMY_RECORD = struct.Struct("<iiiiiidi")
+# x, y, w, h
+RECT_RECORD = struct.Struct("<iiii")
+# width, height, プレイヤーの位置 x, y (-1 ならなし), 部屋の数, 通路の数, 敵の数, タイル層のオフセット, 探索済みフラグのオフセット
+FLOOR_HEADER = struct.Struct("<IIiiIIIQQ")
+
+
+class SaveData:
+    """読み込んだセーブデータ"""
+    def __init__(self, seed, floor_number, game_over, player, floors):
+        self.seed = seed # ゲームの乱数シード（以降の階層の生成に使う）
+        self.floor_number = floor_number # 現在の階層
+        self.game_over = game_over
+        self.player = player
+        # 階層ごとの (DungeonGenerator, プレイヤーの初期位置, 敵のリスト, FieldOfView)。先頭が現在の階層
+        self.floors = floors
+
+
+def write_save(path, seed, floor_number, game_over, player, floors):
+    """
+    ゲームの状態を保存する。書き込みは一時ファイルに行い、最後に置き換える（途中で落ちても前のセーブが残る）。
+
+    Args:
+        path (str): 保存先
+        seed (int): ゲームの乱数シード
+        floor_number (int): 現在の階層
+        game_over (bool): ゲームオーバーか
+        player (Player): プレイヤー
+        floors (list[Floor]): 保存する階層（先頭が現在の階層）
+    """
+    meta_size = FILE_HEADER.size + PLAYER_RECORD.size
+    for floor in floors:
+        generator = floor.dungeon_generator
+        meta_size += (FLOOR_HEADER.size + RECT_RECORD.size * (len(generator.rooms) + len(generator.corridors))
+                      + ENEMY_RECORD.size * len(floor.enemies))
+
+    parts = [
+        FILE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, 0, floor_number, 1 if game_over else 0, len(floors), seed),
+        PLAYER_RECORD.pack(player.x, player.y, player.hp, player.max_hp, player.attack_power),
+    ]
+    layers = []
+    layer_offset = meta_size
+    for floor in floors:
+        generator = floor.dungeon_generator
+        height = len(floor.map_data)
+        width = len(floor.map_data[0]) if height > 0 else 0
+        tiles = pack_map(floor.map_data)
+        explored = bytes(floor.fov.explored)
+        tiles_offset = layer_offset
+        explored_offset = tiles_offset + len(tiles)
+        layer_offset = explored_offset + len(explored)
+        layers.append(tiles)
+        layers.append(explored)
+
+        player_x, player_y = floor.player_pos or (-1, -1)
+        parts.append(FLOOR_HEADER.pack(width, height, player_x, player_y, len(generator.rooms), len(generator.corridors),
+                                       len(floor.enemies), tiles_offset, explored_offset))
+        parts.extend(RECT_RECORD.pack(*room) for room in generator.rooms)
+        parts.extend(RECT_RECORD.pack(*corridor) for corridor in generator.corridors)
+        parts.extend(
+            ENEMY_RECORD.pack(enemy.x, enemy.y, enemy.hp, enemy.max_hp, enemy.attack_power, enemy.sight_range,
+                              enemy.act_chance, -1 if enemy.path_max_distance is None else enemy.path_max_distance)
+            for enemy in floor.enemies
+        )
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.writelines(parts)
+        f.writelines(layers)
+    os.replace(temp_path, path)
+
+
+def read_save(path, backend=MAP_BACKEND, use_mmap=SAVE_MMAP):
+    """
+    セーブデータを読み込む。
+
+    Args:
+        path (str): セーブデータのパス
+        backend (str): 復元するマップの形式 ("list" / "numpy")
+        use_mmap (bool): ファイルを mmap で開くか。"numpy" の場合、タイル層はファイルを直接参照する
+            （コピーオンライトなので、ゲーム中にタイルを書き換えてもファイルは変わらない）
+
+    Returns:
+        SaveData: 読み込んだ状態
+
+    Raises:
+        ValueError: セーブデータでない、またはバージョンが違う場合
+    """
+    with open(path, "rb") as f:
+        if use_mmap:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        else:
+            data = bytearray(os.fstat(f.fileno()).st_size)
+            f.readinto(data)
+
+    if len(data) < FILE_HEADER.size:
+        raise ValueError(f"{path} はセーブデータではありません")
+    magic, version, _, floor_number, game_over, floor_count, seed = FILE_HEADER.unpack_from(data, 0)
+    if magic != SAVE_MAGIC:
+        raise ValueError(f"{path} はセーブデータではありません")
+    if version != SAVE_VERSION:
+        raise ValueError(f"セーブデータのバージョン {version} には対応していません（対応: {SAVE_VERSION}）")
+    offset = FILE_HEADER.size
+
+    def require(start, size):
+        """data[start:start + size] がファイルに収まっていなければ ValueError（壊れた・途中で切れたセーブデータ）"""
+        if start < 0 or start + size > len(data):
+            raise ValueError(f"{path} は壊れています（{start} バイト目から {size} バイトを読めません）")
+
+    require(offset, PLAYER_RECORD.size)
+    x, y, hp, max_hp, attack_power = PLAYER_RECORD.unpack_from(data, offset)
+    offset += PLAYER_RECORD.size
+    player = Player(x, y)
+    player.hp = hp
+    player.max_hp = max_hp
+    player.attack_power = attack_power
+
+    floors = []
+    for _ in range(floor_count):
+        require(offset, FLOOR_HEADER.size)
+        (width, height, player_x, player_y, room_count, corridor_count, enemy_count,
+         tiles_offset, explored_offset) = FLOOR_HEADER.unpack_from(data, offset)
+        offset += FLOOR_HEADER.size
+        require(offset, RECT_RECORD.size * (room_count + corridor_count) + ENEMY_RECORD.size * enemy_count)
+        require(tiles_offset, width * height)
+        require(explored_offset, width * height)
+
+        rooms = [RECT_RECORD.unpack_from(data, offset + i * RECT_RECORD.size) for i in range(room_count)]
+        offset += RECT_RECORD.size * room_count
+        corridors = [RECT_RECORD.unpack_from(data, offset + i * RECT_RECORD.size) for i in range(corridor_count)]
+        offset += RECT_RECORD.size * corridor_count
+
+        enemies = []
+        for i in range(enemy_count):
+            (x, y, hp, max_hp, attack_power, sight_range, act_chance,
+             path_max_distance) = ENEMY_RECORD.unpack_from(data, offset + i * ENEMY_RECORD.size)
+            enemy = Enemy(x, y)
+            enemy.hp = hp
+            enemy.max_hp = max_hp
+            enemy.attack_power = attack_power
+            enemy.sight_range = sight_range
+            enemy.act_chance = act_chance
+            enemy.path_max_distance = None if path_max_distance < 0 else path_max_distance
+            enemies.append(enemy)
+        offset += ENEMY_RECORD.size * enemy_count
+
+        generator = DungeonGenerator(backend=backend)
+        generator.restore(map_from_buffer(data, tiles_offset, width, height, backend), rooms, corridors)
+        fov = FieldOfView(generator.map_data)
+        fov.explored[:] = data[explored_offset:explored_offset + width * height]
+        player_pos = (player_x, player_y) if player_x >= 0 else None
+        floors.append((generator, player_pos, enemies, fov))
+
+    return SaveData(seed, floor_number, bool(game_over), player, floors)
@@ -5,8 +5,48 @@ COLS = 30
 UI_HEIGHT = 80  # UI表示用の高さ
 SCREEN_WIDTH = TILE_SIZE * COLS
 SCREEN_HEIGHT = TILE_SIZE * ROWS + UI_HEIGHT  # マップ領域 + UI領域
+# マップの大きさ（タイル数）。画面に映る範囲 (COLS x ROWS) より大きければカメラがプレイヤーを追ってスクロールする
+MAP_COLS = COLS
+MAP_ROWS = ROWS
 FPS = 60
 MOVE_DELAY = 200
+# 描画モード ("full": 毎フレーム全体を描画して flip / "dirty": 変化した領域だけ描き直して update)
+RENDER_MODE = "full"
+# メインループ ("poll": FPSごとに毎フレーム処理 / "event": 入力が来るまでスリープし、入力時だけ更新・描画)
+LOOP_MODE = "poll"
+# LOOP_MODE = "event" でイベントを待つ最大時間（ミリ秒、0なら無期限）。アニメーション用
+EVENT_WAIT_TIMEOUT = 500
+# 拡大縮小済みの画像アトラスを保存するディレクトリ（次回以降の起動が速くなる）。None ならディスクに保存しない
+ASSET_CACHE_DIR = None
+# セーブデータの保存先（F5 で保存、F9 で読み込み）
+SAVE_PATH = "savegame.dat"
+# セーブデータを mmap で読み込むか（MAP_BACKEND = "numpy" ならタイル層をコピーせずファイルを直接参照する）
+SAVE_MMAP = True
+# 1ゲームごとの行動の記録 (replay_<seed>.json) を書き出すディレクトリ。None なら記録しない
+# 記録は python -m benchmarks.bench_replay で再生・計測できる
+REPLAY_RECORD_DIR = None
+# 描画済みテキストの Surface をキャッシュしておく数の上限
+TEXT_CACHE_SIZE = 256
+
+# Message log
+# メッセージログに残す件数（古いものから捨てる）
+MESSAGE_LOG_SIZE = 100
+# UI領域に表示するメッセージの行数
+MESSAGE_LOG_LINES = 4
+# メッセージログに残すレベル (10: DEBUG / 20: INFO / 30: WARNING)。これ未満のメッセージは捨てる
+MESSAGE_LOG_LEVEL = 20
+# メッセージを追記するファイル（バックグラウンドのスレッドでまとめて書き込む）。None なら書き出さない
+MESSAGE_LOG_PATH = None
+# ファイルに書き出すメッセージのレベル
+MESSAGE_FILE_LEVEL = 10
+
+# Profiling
+# 処理時間の計測を有効にするか（ゲーム中は F3 で切り替え、UI領域に結果を表示する）
+PROFILE_ENABLED = False
+# 計測結果を確定して表示・書き出しする間隔（秒）
+PROFILE_WINDOW = 1.0
+# 確定した計測結果を1行1JSONで追記するファイル。None なら書き出さない
+PROFILE_DUMP_PATH = None
 
 # Dungeon generation (BSP)
 # BSP分割の深さ（大きいほど部屋・通路が増えやすい）
@@ -19,6 +59,16 @@ BSP_MIN_ROOM_SIZE = 5
 BSP_ROOM_MARGIN = 1
 # 縦横比がこの倍率を超えたら分割方向を寄せる
 BSP_ASPECT_RATIO_THRESHOLD = 1.5
+# プレイ中に次の階層をワーカースレッドで先読み生成しておくか（階段での切り替えを一瞬にする）
+FLOOR_PREFETCH = True
+
+# 視界 (FOV) の半径（タイル数）。見えている範囲の外は描画せず、敵もプレイヤーから見えていなければ気づかない
+FOV_RADIUS = 10
+# 一度見たが今は見えていないタイルに重ねる暗幕の不透明度 (0-255)
+FOG_ALPHA = 160
+
+# マップデータの形式 ("list": list[list[int]] / "numpy": uint8 の NumPy 配列。NumPy が必要)
+MAP_BACKEND = "list"
 
 # tile values
 TILE_FLOOR = 0
@@ -39,4 +89,23 @@ PLAYER_ATTACK_POWER = 5
 ENEMY_HP = 10
 ENEMY_ATTACK_POWER = 2
 ENEMY_SIGHT_RANGE = 8
-ENEMY_ACT_CHANCE = 0.7
\ No newline at end of file
+ENEMY_ACT_CHANCE = 0.7
+# 敵の追跡方法 ("distance_map": ターンごとに1回BFSで距離マップを作り全敵で共有 / "astar": 敵ごとに find_path /
+#              "hierarchical": 部屋・通路のグラフで経路を決めてから近くだけタイル単位で探索)
+ENEMY_PATHFINDING = "distance_map"
+# 敵の行動フェーズ ("per_enemy": 1体ずつ判定 / "batched": 行動判定とランダム移動を NumPy でまとめて計算。NumPy が必要)
+ENEMY_PHASE = "per_enemy"
+# 敵が追跡する経路長の上限（これより遠回りになる場合は追跡をあきらめる）。None なら無制限
+ENEMY_PATH_MAX_DISTANCE = ENEMY_SIGHT_RANGE * 2
+
+# Pathfinding
+# find_path の探索エンジン ("astar": A* / "jps": Jump Point Search。広い部屋で展開ノードが少ない)
+PATHFINDING_ALGORITHM = "astar"
+# find_path で展開するノード数の上限（超えたら経路なしとして打ち切る）。None なら無制限
+PATHFINDING_MAX_NODES = None
+# 階層的経路探索で、タイル単位の探索を行う部屋・通路の数（今いる部屋・通路を含む）
+HIERARCHICAL_WINDOW = 3
+# ENEMY_PATHFINDING = "astar" のとき、敵ごとに前回の経路をキャッシュして使い回すか
+ENEMY_PATH_CACHE = True
+# キャッシュした経路を、探索し直さずにゴールの移動に合わせて修復する回数の上限
+PATH_CACHE_MAX_REPAIRS = 4
\ No newline at end of file
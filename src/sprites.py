@@ -0,0 +1,20 @@
+import pygame
+from src.settings import TILE_SIZE
+
+
+class EntitySprite(pygame.sprite.Sprite):
+    """エンティティ（src/entities.py）を描画するためのスプライト"""
+    def __init__(self, entity, image):
+        super().__init__()
+        self.entity = entity # 描画対象のエンティティ
+        self.image = image
+        self.rect = self.image.get_rect() # 位置とサイズを管理する矩形
+        self.update()
+
+    def update(self):
+        """エンティティのタイル座標に合わせて矩形を動かす。倒されていればグループから外す。"""
+        if not self.entity.is_alive:
+            self.kill()
+            return
+        self.rect.x = self.entity.x * TILE_SIZE
+        self.rect.y = self.entity.y * TILE_SIZE
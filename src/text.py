@@ -0,0 +1,48 @@
+import pygame
+from collections import OrderedDict
+from src.settings import TEXT_CACHE_SIZE
+
+
+class TextCache:
+    """
+    UI用のフォントと描画済みテキストのキャッシュ。
+    pygame.font.SysFont はシステムフォントを探すので遅く、毎フレーム呼ぶと描画時間の大きな割合を占める。
+    フォントはサイズごとに1回だけ読み込み、描画したテキストの Surface は (サイズ, 文字列, 色) ごとに使い回す。
+    HPや階層の表示は値が変わったときだけ描画し直されることになる。
+    """
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries # 保持するテキスト Surface の上限（古く使われていないものから捨てる）
+        self._fonts = {} # サイズ -> Font
+        self._surfaces = OrderedDict() # (サイズ, 文字列, 色) -> Surface
+
+    def font(self, size):
+        """サイズに対応するフォントを返す（初回だけ読み込む）"""
+        font = self._fonts.get(size)
+        if font is None:
+            font = pygame.font.SysFont(None, size)
+            self._fonts[size] = font
+        return font
+
+    def render(self, text, size, color):
+        """
+        テキストを描画した Surface を返す（同じ内容なら前回の Surface をそのまま返す）。
+        
+        Args:
+            text (str): 表示する文字列
+            size (int): フォントサイズ
+            color (tuple): 文字色 (R, G, B)
+            
+        Returns:
+            pygame.Surface: 描画済みのテキスト
+        """
+        key = (size, text, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            return surface
+        
+        surface = self.font(size).render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface